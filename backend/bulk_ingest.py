@@ -0,0 +1,143 @@
+import codecs
+import csv
+import io
+import json
+import re
+from typing import AsyncIterator
+
+# Incremental parsers for bulk uploads. They consume an async stream of byte chunks and
+# yield one record at a time, so only the current chunk and the record being parsed are
+# ever held in memory, whatever the size of the upload.
+
+# A single record larger than this is rejected instead of buffered indefinitely.
+MAX_RECORD_BYTES = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class BulkParseError(ValueError):
+    """Raised when an upload is malformed; records yielded before the error are valid."""
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+    """Yields the elements of a top-level JSON array as soon as each one is fully received."""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    chunk_iterator = chunks.__aiter__()
+    buffer = ""
+    position = 0  # Parsed up to here; the buffer is only compacted when more data is read.
+    has_more = True
+    # What comes next: '[', an element or ']' (first), an element (after ','), ',' or ']', or nothing.
+    state = "open"
+
+    async def read_more() -> None:
+        nonlocal buffer, position, has_more
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += text.decode(await chunk_iterator.__anext__())
+        except StopAsyncIteration:
+            buffer += text.decode(b"", final=True)
+            has_more = False
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if not has_more:
+                if state != "done":
+                    raise BulkParseError("Unexpected end of JSON input")
+                return
+            await read_more()
+            continue
+
+        char = buffer[position]
+        if state == "done":
+            raise BulkParseError("Unexpected data after the JSON array")
+        if state == "open":
+            if char != "[":
+                raise BulkParseError("Expected a JSON array of loads")
+            position += 1
+            state = "first"
+            continue
+        if state in ("first", "separator") and char == "]":
+            position += 1
+            state = "done"
+            continue
+        if state == "separator":
+            if char != ",":
+                raise BulkParseError("Expected ',' or ']' between array elements")
+            position += 1
+            state = "element"
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # Either the element is still incomplete (read on) or it is invalid.
+            if len(buffer) - position > MAX_RECORD_BYTES:
+                raise BulkParseError(f"A load is larger than {MAX_RECORD_BYTES} bytes") from e
+            if not has_more:
+                if e.pos >= len(buffer):
+                    raise BulkParseError("Unexpected end of JSON input") from e
+                raise BulkParseError(f"Invalid JSON: {e.msg}") from e
+            await read_more()
+            continue
+        # A number at the very end of the buffer may continue in the next chunk ("12" + "34").
+        if end == len(buffer) and has_more:
+            await read_more()
+            continue
+        position = end
+        state = "separator"
+        yield value
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """
+    Yields the rows of a CSV upload as dicts keyed by the header row. Empty cells are
+    left out, so optional fields fall back to their defaults.
+    """
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    header = None
+
+    def records(complete: str):
+        nonlocal header
+        for row in csv.reader(io.StringIO(complete)):
+            if not row:
+                continue
+            if header is None:
+                header = [name.strip() for name in row]
+                continue
+            yield {name: value.strip() for name, value in zip(header, row) if name and value.strip()}
+
+    async for chunk in chunks:
+        pending += text.decode(chunk)
+        end = _complete_records_end(pending)
+        if end:
+            for record in records(pending[:end]):
+                yield record
+            pending = pending[end:]
+        elif len(pending) > MAX_RECORD_BYTES:
+            raise BulkParseError(f"A CSV row is larger than {MAX_RECORD_BYTES} bytes")
+
+    pending += text.decode(b"", final=True)
+    if pending.count('"') % 2:
+        raise BulkParseError("Unterminated quoted field at the end of the CSV")
+    for record in records(pending):
+        yield record
+
+
+def _complete_records_end(text: str) -> int:
+    """
+    Returns the length of the longest prefix of `text` made of complete CSV records: it
+    ends with a newline that is not inside a quoted field (an even number of quotes so far).
+    """
+    end = 0
+    position = 0
+    quotes = 0
+    for line in text.splitlines(keepends=True):
+        position += len(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0 and line.endswith(("\n", "\r")):
+            end = position
+    return end
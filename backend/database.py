@@ -1,43 +1,382 @@
 # backend/database.py
-import firebase_admin
-from firebase_admin import credentials, firestore
+import contextvars
+import inspect
+import itertools
 import os
 import pathlib
+import threading
+import time
 from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
 
 # Load environment variables from .env file
 project_root = pathlib.Path(__file__).parent.parent
 dotenv_path = project_root / ".env"
 load_dotenv(dotenv_path=dotenv_path)
 
-# Initialize db to None. It will be populated if Firebase initializes correctly.
+# Initialize db to None. It is set to a lazily-created client if credentials are configured.
+# `async_db` is the native asyncio client used by `async def` route handlers.
 db = None
+async_db = None
+
+# Number of documents pulled per threadpool hop when streaming from the sync client.
+STREAM_CHUNK_SIZE = 100
+
+# When enabled, every response carries the Firestore usage of its request as X-Firestore-* headers.
+FIRESTORE_DEBUG_HEADERS = os.getenv("FIRESTORE_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+
+# Client method names, by the kind of billed operation they perform.
+READ_METHODS = frozenset({"get", "get_all", "stream"})
+WRITE_METHODS = frozenset({"set", "update", "delete", "create", "add", "commit"})
+
+# Methods that return another client object (a collection, document, query or batch),
+# which is wrapped in turn so that the calls made on it are recorded too.
+CHAINED_METHODS = frozenset({
+    "collection", "collection_group", "document", "where", "order_by", "limit", "limit_to_last",
+    "offset", "select", "start_at", "start_after", "end_at", "end_before", "batch", "transaction",
+})
+
+# After a client fails to initialize, uses of it fail fast with the same error for this
+# long before initialization (and its failure report) is tried again.
+FIRESTORE_INIT_RETRY_SECONDS = float(os.getenv("FIRESTORE_INIT_RETRY_SECONDS", "30"))
 
 cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
+_init_lock = threading.Lock()
+_firebase_app = None
+
+
+def _print_init_failure(error: Exception) -> None:
+    print("---")
+    print(f"🔥 FAILED to initialize Firebase or connect to Firestore.")
+    print(f"   Error: {error}")
+    print("   Troubleshooting steps:")
+    print("   1. Verify the GOOGLE_APPLICATION_CREDENTIALS path in your .env file is correct.")
+    print("   2. Ensure the JSON file is a valid Firebase service account key.")
+    print("   3. Check your internet connection and Firebase project status.")
+    print("---")
+
+
+def _initialize_firebase():
+    """Initializes the Firebase app once. firebase_admin is only imported here, on first use."""
+    global _firebase_app
+    with _init_lock:
+        if _firebase_app is None:
+            import firebase_admin
+            from firebase_admin import credentials
+            try:
+                _firebase_app = firebase_admin.initialize_app(credentials.Certificate(cred_path))
+            except Exception as e:
+                _print_init_failure(e)
+                raise
+            print("✅ Firebase initialized successfully.")
+    return _firebase_app
+
+
+def _create_sync_client():
+    _initialize_firebase()
+    from firebase_admin import firestore
+    return firestore.client()
+
+
+def _create_async_client():
+    _initialize_firebase()
+    from firebase_admin import firestore_async
+    return firestore_async.client()
+
+
+class LazyClient:
+    """
+    Stands in for a Firestore client and creates the real one on first use, so importing
+    the backend neither initializes Firebase nor touches the network. Every attribute
+    access is forwarded to the real client. A failed creation is remembered and re-raised
+    for `retry_seconds` before it is attempted again.
+    """
+
+    def __init__(self, factory, retry_seconds: float = FIRESTORE_INIT_RETRY_SECONDS):
+        self._factory = factory
+        self.retry_seconds = retry_seconds
+        self._client = None
+        self._error = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    if self._error is not None and time.monotonic() - self._failed_at < self.retry_seconds:
+                        raise self._error.with_traceback(None)
+                    try:
+                        self._client = self._factory()
+                    except Exception as e:
+                        self._error = e
+                        self._failed_at = time.monotonic()
+                        raise
+                    self._error = None
+                client = self._client
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+
+class FirestoreUsage:
+    """The Firestore calls, document reads and writes, and time spent on them for one request."""
+
+    __slots__ = ("calls", "reads", "writes", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.reads = 0
+        self.writes = 0
+        self.seconds = 0.0
+
+    def add(self, reads: int = 0, writes: int = 0, seconds: float = 0.0, calls: int = 1) -> None:
+        self.calls += calls
+        self.reads += reads
+        self.writes += writes
+        self.seconds += seconds
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        """Returns the usage as raw ASGI response headers."""
+        return [
+            (b"x-firestore-calls", str(self.calls).encode()),
+            (b"x-firestore-reads", str(self.reads).encode()),
+            (b"x-firestore-writes", str(self.writes).encode()),
+            (b"x-firestore-time-ms", f"{self.seconds * 1000:.1f}".encode()),
+        ]
+
+
+# Usage of the request being served. Set by the metrics middleware; None outside of requests.
+# Threadpool calls run in a copy of the context, so they add to the same object.
+firestore_usage: contextvars.ContextVar[FirestoreUsage | None] = contextvars.ContextVar(
+    "firestore_usage", default=None
+)
+
+
+def record_firestore(reads: int = 0, writes: int = 0, seconds: float = 0.0, calls: int = 1) -> None:
+    """Attributes Firestore work to the current request, if there is one."""
+    usage = firestore_usage.get()
+    if usage is not None:
+        usage.add(reads, writes, seconds, calls)
+
+
+def _count_documents(name: str, result) -> tuple[int, int]:
+    """Returns the (reads, writes) a completed client call was billed for."""
+    if name in READ_METHODS:
+        # Query.get returns a list of snapshots; DocumentReference.get a single one.
+        return (len(result) if isinstance(result, list) else 1), 0
+    if name in WRITE_METHODS:
+        # A batch commit returns one WriteResult per write.
+        return 0, (len(result) if name == "commit" and isinstance(result, list) else 1)
+    return 0, 0
+
+
+def _unwrap(value):
+    """Returns the client object behind a wrapper, also inside lists and tuples of references."""
+    if isinstance(value, Instrumented):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+
+def _result(name: str, result):
+    """Returns the result of a billed call, wrapping the document reference `add` hands out."""
+    if name == "add":
+        # CollectionReference.add returns (update_time, DocumentReference).
+        update_time, ref = result
+        return update_time, Instrumented(ref)
+    return result
+
+
+def _stream(results, started: float):
+    """Yields the snapshots of a sync stream, counting one read per document."""
+    usage = firestore_usage.get()
+    reads = 0
+    seconds = time.perf_counter() - started
+    iterator = iter(results)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                doc = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - started
+            reads += 1
+            yield doc
+    finally:
+        if usage is not None:
+            usage.add(reads=reads, seconds=seconds)
+
+
+async def _astream(results, started: float):
+    """Yields the snapshots of an async stream, counting one read per document."""
+    usage = firestore_usage.get()
+    reads = 0
+    seconds = time.perf_counter() - started
+    iterator = results.__aiter__()
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                doc = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - started
+            reads += 1
+            yield doc
+    finally:
+        if usage is not None:
+            usage.add(reads=reads, seconds=seconds)
+
+
+class Instrumented:
+    """
+    Wraps a Firestore client, or a collection, document, query or batch obtained from it,
+    and records the reads, writes and wall time of every billed call against the current
+    request. Objects returned by query-building calls are wrapped in turn; everything else
+    is forwarded unchanged, so code written against the client works the same with this.
+    """
+
+    __slots__ = ("_target",)
+
+    # Calls billed on this kind of object.
+    billed = READ_METHODS | WRITE_METHODS
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in self.billed:
+            return self._billed(name, attr)
+        wrapper = InstrumentedBatch if name in ("batch", "transaction") else Instrumented
+        chained = name in CHAINED_METHODS
+
+        def call(*args, **kwargs):
+            result = attr(*_unwrap(args), **kwargs)
+            return wrapper(result) if chained else result
+
+        return call
+
+    def __repr__(self):
+        return f"Instrumented({self._target!r})"
+
+    @staticmethod
+    def _billed(name: str, method):
+        if inspect.iscoroutinefunction(method):
+            async def call_async(*args, **kwargs):
+                started = time.perf_counter()
+                result = await method(*_unwrap(args), **kwargs)
+                record_firestore(*_count_documents(name, result), time.perf_counter() - started)
+                return _result(name, result)
+
+            return call_async
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            result = method(*_unwrap(args), **kwargs)
+            if name in ("stream", "get_all"):
+                # Streams are generators; their reads are counted as they are consumed.
+                if hasattr(result, "__aiter__"):
+                    return _astream(result, started)
+                return _stream(result, started)
+            record_firestore(*_count_documents(name, result), time.perf_counter() - started)
+            return _result(name, result)
+
+        return call
+
+
+class InstrumentedBatch(Instrumented):
+    """A wrapped batch or transaction: writes are only billed when they are committed."""
+
+    __slots__ = ()
+
+    billed = READ_METHODS | {"commit"}
+
+    def __len__(self):
+        # The number of writes pending in the batch.
+        return len(self._target)
+
+
+def warm_up() -> bool:
+    """
+    Creates the Firebase app and the sync client ahead of the first request. Meant to run
+    in a background thread after startup; returns whether Firestore is usable.
+    """
+    if db is None:
+        return False
+    try:
+        db.get_client()
+    except Exception:
+        return False
+    return True
+
+
 if not cred_path:
     print("---")
     print("⚠️  WARNING: GOOGLE_APPLICATION_CREDENTIALS environment variable not set.")
     print("    Firebase will not be initialized. The application will not connect to the database.")
     print("    Please create a .env file in the project root and set the variable.")
     print("---")
+elif not os.path.exists(cred_path):
+    _print_init_failure(FileNotFoundError(f"The service account file was not found at the specified path: {cred_path}"))
 else:
-    try:
-        if not os.path.exists(cred_path):
-             raise FileNotFoundError(f"The service account file was not found at the specified path: {cred_path}")
-        
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        print("✅ Firebase initialized successfully.")
-        collections = list(db.collections())
-        print(f"✅ Successfully connected to Firestore. Found {len(collections)} collections.")
-    except Exception as e:
-        print("---")
-        print(f"🔥 FAILED to initialize Firebase or connect to Firestore.")
-        print(f"   Error: {e}")
-        print("   Troubleshooting steps:")
-        print("   1. Verify the GOOGLE_APPLICATION_CREDENTIALS path in your .env file is correct.")
-        print("   2. Ensure the JSON file is a valid Firebase service account key.")
-        print("   3. Check your internet connection and Firebase project status.")
-        print("---")
+    db = Instrumented(LazyClient(_create_sync_client))
+    async_db = Instrumented(LazyClient(_create_async_client))
+
+# The client the routers talk to: the native async client when there is one; the sync
+# client is only used through the threadpool.
+store = async_db if async_db is not None else db
+
+
+
+
+async def call_firestore(method, *args, **kwargs):
+    """
+    Calls a Firestore client method from async code. Coroutine methods of the AsyncClient
+    are awaited directly. Blocking methods of the sync client are off-loaded to the
+    threadpool so they never stall the event loop.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs)
+
+
+async def stream_documents(query, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Asynchronously yields the documents of a query built on either client.
+    Results from the sync client are fetched `chunk_size` documents per threadpool hop.
+    """
+    results = query.stream()
+    if hasattr(results, "__aiter__"):
+        async for doc in results:
+            yield doc
+        return
+
+    iterator = iter(results)
+    while True:
+        chunk = await run_in_threadpool(list, itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        for doc in chunk:
+            yield doc
+
+
+async def get_documents(client, refs) -> list:
+    """
+    Fetches many documents in a single `get_all` round trip with either client.
+    Missing documents are returned as snapshots whose `exists` is False; the order is unspecified.
+    """
+    results = client.get_all(refs)
+    if hasattr(results, "__aiter__"):
+        return [doc async for doc in results]
+    return await run_in_threadpool(list, results)
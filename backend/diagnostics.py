@@ -0,0 +1,71 @@
+import builtins
+import sys
+import time
+
+# Startup diagnostics: an in-process summary of `python -X importtime`, recorded while
+# backend.main imports the app, plus how long the lifespan startup took.
+
+
+class ImportTimer:
+    """
+    Times first-time imports by wrapping `builtins.__import__` between `start()` and
+    `stop()`. For each module it keeps the cumulative time (including the modules it
+    imported) and the self time, like `-X importtime` does.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.total_seconds = None
+        self.modules_loaded = 0
+        self._stack = []
+        self._original_import = None
+        self._started_at = None
+        self._modules_before = 0
+
+    def start(self) -> None:
+        self._original_import = builtins.__import__
+        self._modules_before = len(sys.modules)
+        self._started_at = time.perf_counter()
+        builtins.__import__ = self._import
+
+    def stop(self) -> None:
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        self._original_import = None
+        self.total_seconds = time.perf_counter() - self._started_at
+        self.modules_loaded = len(sys.modules) - self._modules_before
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Relative imports and modules that are already loaded cost next to nothing.
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records[name] = (elapsed, elapsed - children)
+
+    def report(self, limit: int = 20) -> dict:
+        """Returns the total import time and the `limit` slowest imports, by cumulative time."""
+        slowest = sorted(self.records.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return {
+            "total_ms": None if self.total_seconds is None else round(self.total_seconds * 1000, 1),
+            "modules_loaded": self.modules_loaded,
+            "slowest": [
+                {"module": name, "cumulative_ms": round(cumulative * 1000, 1), "self_ms": round(own * 1000, 1)}
+                for name, (cumulative, own) in slowest
+            ],
+        }
+
+
+import_timer = ImportTimer()
+
+# Filled in by the lifespan hook in backend.main.
+startup_timings = {"lifespan_ms": None}
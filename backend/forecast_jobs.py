@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from backend.forecasting import (
+    FORECAST_DAYS, SEGMENT_FIELDS, ForecastModel, daily_series_from_counts, forecast_segments,
+    forecast_with_budget, segment_daily_counts
+)
+from backend.load_stats import read_daily_counts, read_posted_loads
+
+# Precomputed forecasts, written by forecast_job.py and served by /predictions. One
+# document per forecast: 'global' for the daily total, and one per segmentation ('lane',
+# 'material') holding the forecasts of its busiest segments.
+FORECASTS_COLLECTION = "forecasts"
+GLOBAL_FORECAST_ID = "global"
+
+# Stored forecasts older than this are ignored and computed on demand instead. Set it a
+# little above the interval the job runs at.
+FORECAST_MAX_AGE_SECONDS = float(os.getenv("FORECAST_MAX_AGE_SECONDS", "86400"))
+
+# Segmentations the job forecasts besides the global series, e.g. "lane,material".
+FORECAST_JOB_SEGMENTS = [by for by in os.getenv("FORECAST_JOB_SEGMENTS", "").split(",") if by.strip()]
+
+
+def compute_global_forecast(
+    client,
+    horizon: int = FORECAST_DAYS,
+    model: ForecastModel = "auto",
+    budget_ms: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Forecasts the daily load total from the daily counters. Returns the document to
+    store, or None when there are no counters yet.
+    """
+    counts = read_daily_counts(client)
+    if not counts:
+        return None
+    result = forecast_with_budget(daily_series_from_counts(counts), horizon, model, budget_ms)
+    return {
+        **result,
+        "data_through": max(counts),
+        "generated_at": datetime.now(timezone.utc),
+    }
+
+
+def compute_segment_forecasts(
+    client,
+    by: str,
+    top: int = 50,
+    history_days: int = 180,
+    horizon: int = FORECAST_DAYS,
+    model: ForecastModel = "auto",
+    budget_ms: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Forecasts the `top` busiest segments of a segmentation (a key of SEGMENT_FIELDS) in the
+    forecast pool. Returns the document to store, or None when no loads were posted.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=history_days)
+    rows = read_posted_loads(client, SEGMENT_FIELDS[by], since)
+    if not rows:
+        return None
+    segments = forecast_segments(segment_daily_counts(rows, by, top), horizon, model, budget_ms)
+    return {
+        "by": by,
+        "top": top,
+        "history_days": history_days,
+        "horizon": horizon,
+        "segments": segments,
+        "generated_at": datetime.now(timezone.utc),
+    }
+
+
+def write_forecast(client, forecast_id: str, forecast: dict) -> None:
+    """Stores a forecast document, replacing the previous one."""
+    client.collection(FORECASTS_COLLECTION).document(forecast_id).set(forecast)
+
+
+def read_stored_forecast(client, forecast_id: str, max_age_seconds: float = FORECAST_MAX_AGE_SECONDS) -> Optional[dict]:
+    """
+    Returns a stored forecast document with a single read, or None when there is none
+    or it was generated more than `max_age_seconds` ago.
+    """
+    doc = client.collection(FORECASTS_COLLECTION).document(forecast_id).get()
+    if not doc.exists:
+        return None
+    forecast = doc.to_dict()
+    return forecast if is_fresh(forecast, max_age_seconds) else None
+
+
+def is_fresh(forecast: dict, max_age_seconds: float = FORECAST_MAX_AGE_SECONDS) -> bool:
+    """Whether a stored forecast document was generated less than `max_age_seconds` ago."""
+    generated_at = forecast.get("generated_at")
+    if not isinstance(generated_at, datetime):
+        return False
+    return datetime.now(timezone.utc) - generated_at <= timedelta(seconds=max_age_seconds)
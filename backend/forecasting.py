@@ -0,0 +1,366 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import TYPE_CHECKING, Literal, Optional
+
+# pandas and statsmodels take seconds to import, so they are only imported by the
+# functions that need them: app startup doesn't pay for them until the first forecast.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# We need at least 15 data points to train a simple model
+MIN_HISTORY_DAYS = 15
+FORECAST_DAYS = 7
+MAX_FORECAST_HORIZON = 90
+
+# `auto` picks the most accurate model that fits the data and the time budget.
+ForecastModel = Literal["auto", "sarimax", "holt_winters", "seasonal_naive"]
+
+# Segmented forecasts: the load fields that identify a segment, per segmentation.
+SEGMENT_FIELDS = {"lane": ("origin", "destination"), "material": ("material_type",)}
+
+# Default time budgets of a forecast and of each segment's forecast, and the worker
+# processes that fit segments in parallel (0 fits them one after the other in the caller).
+FORECAST_BUDGET_MS = int(os.getenv("FORECAST_BUDGET_MS", "2000"))
+FORECAST_SEGMENT_BUDGET_MS = int(os.getenv("FORECAST_SEGMENT_BUDGET_MS", "2000"))
+FORECAST_POOL_WORKERS = int(os.getenv("FORECAST_POOL_WORKERS", str(os.cpu_count() or 1)))
+# Allowance on top of the segment budgets for starting workers and importing pandas and
+# statsmodels in them; segments still unfinished after that are reported as failed.
+FORECAST_POOL_OVERHEAD_MS = int(os.getenv("FORECAST_POOL_OVERHEAD_MS", "15000"))
+# Workers are started by a forkserver (spawn where that is unavailable), not forked from
+# a process whose Firestore channels and threads may hold locks.
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class InsufficientDataError(ValueError):
+    """Raised when there is not enough history to fit a forecast."""
+
+
+class FitBudgetExceeded(TimeoutError):
+    """Raised from inside the optimizer when a model fit runs past its time budget."""
+
+
+def daily_load_counts(posted_dates) -> "pd.Series":
+    """
+    Turns a sequence of `posted_date` values into a daily series of load counts,
+    filling days without any loads with 0.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(posted_dates, columns=['posted_date'])
+    df['posted_date'] = pd.to_datetime(df['posted_date'])
+    df.set_index('posted_date', inplace=True)
+    df['loads'] = 1
+
+    # Resample to get daily counts, filling missing days with 0
+    return df['loads'].resample('D').sum().asfreq('D', fill_value=0)
+
+
+def daily_series_from_counts(counts: dict[str, int]) -> "pd.Series":
+    """
+    Turns a {'YYYY-MM-DD': count} mapping (the daily counter documents) into a
+    daily series of load counts, filling days without a counter with 0.
+    """
+    import pandas as pd
+
+    series = pd.Series(counts, dtype='int64')
+    series.index = pd.to_datetime(series.index)
+    return series.sort_index().asfreq('D', fill_value=0)
+
+
+def _check_history(daily_loads: "pd.Series", min_days: int) -> None:
+    if len(daily_loads) < min_days:
+        raise InsufficientDataError(
+            f"Not enough data to create a forecast. Need at least {min_days} days of data, "
+            f"but only have {len(daily_loads)}."
+        )
+
+
+def _forecast_rows(daily_loads: "pd.Series", predicted) -> list[dict]:
+    """Pairs predicted values with the days following the series, as rounded, non-negative counts."""
+    import pandas as pd
+
+    last_date = daily_loads.index[-1]
+    forecast_dates = pd.date_range(start=last_date + timedelta(days=1), periods=len(predicted))
+    return [
+        {"date": date.strftime('%Y-%m-%d'), "predicted_loads": max(0, round(value))}
+        for date, value in zip(forecast_dates, predicted)
+    ]
+
+
+def forecast_daily_loads(
+    daily_loads: "pd.Series",
+    steps: int = FORECAST_DAYS,
+    budget_seconds: Optional[float] = None,
+) -> list[dict]:
+    """
+    Fits a SARIMA time-series model on a daily series and predicts the next `steps` days.
+    Raises InsufficientDataError if the series is shorter than MIN_HISTORY_DAYS, and
+    FitBudgetExceeded if the fit is still iterating after `budget_seconds`.
+    """
+    _check_history(daily_loads, MIN_HISTORY_DAYS)
+
+    import statsmodels.api as sm
+
+    # The (p,d,q) and (P,D,Q,m) orders are hyperparameters. These are common starting points.
+    # m=7 indicates a weekly seasonal pattern.
+    model = sm.tsa.SARIMAX(
+        daily_loads,
+        order=(1, 1, 1),
+        seasonal_order=(1, 1, 1, 7),
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    )
+
+    callback = None
+    if budget_seconds is not None:
+        deadline = time.perf_counter() + budget_seconds
+
+        def _deadline_callback(params):
+            # Called by the optimizer after every iteration.
+            if time.perf_counter() > deadline:
+                raise FitBudgetExceeded(f"Model fit exceeded its {budget_seconds * 1000:.0f} ms budget.")
+
+        callback = _deadline_callback
+
+    results = model.fit(disp=False, callback=callback)
+    return _forecast_rows(daily_loads, results.get_forecast(steps=steps).predicted_mean)
+
+
+def forecast_holt_winters(
+    daily_loads: "pd.Series",
+    steps: int = FORECAST_DAYS,
+    budget_seconds: Optional[float] = None,
+) -> list[dict]:
+    """
+    Additive Holt-Winters (trend plus weekly seasonality) exponential smoothing. About as
+    accurate as SARIMAX on these series at a fraction of the fit time; needs two full weeks.
+    The fit can't be interrupted, so forecast_with_budget checks `budget_seconds` once it ends.
+    """
+    _check_history(daily_loads, MODEL_MIN_HISTORY_DAYS["holt_winters"])
+
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    model = ExponentialSmoothing(
+        daily_loads.astype(float),
+        trend="add",
+        seasonal="add",
+        seasonal_periods=7,
+        initialization_method="estimated",
+    )
+    return _forecast_rows(daily_loads, model.fit().forecast(steps))
+
+
+def forecast_seasonal_naive(
+    daily_loads: "pd.Series",
+    steps: int = FORECAST_DAYS,
+    budget_seconds: Optional[float] = None,
+) -> list[dict]:
+    """Repeats the average of each weekday over the last four weeks. No fitting, so it always answers in time."""
+    _check_history(daily_loads, MODEL_MIN_HISTORY_DAYS["seasonal_naive"])
+
+    recent = daily_loads.iloc[-28:].to_numpy(dtype=float)
+    # profile[phase] averages the days one, two, ... weeks before the forecast day `phase`.
+    profile = [recent[len(recent) - 7 + phase::-7].mean() for phase in range(7)]
+    return _forecast_rows(daily_loads, [profile[step % 7] for step in range(steps)])
+
+
+# Forecast models from the most to the least accurate. `auto` starts at the first one and
+# falls back down the list when the data is too short or the budget would be exceeded.
+MODELS = {
+    "sarimax": forecast_daily_loads,
+    "holt_winters": forecast_holt_winters,
+    "seasonal_naive": forecast_seasonal_naive,
+}
+MODEL_MIN_HISTORY_DAYS = {"sarimax": MIN_HISTORY_DAYS, "holt_winters": 14, "seasonal_naive": 7}
+
+# Expected fit time of each model: a fixed overhead plus a per-day cost, in ms. The
+# per-day cost starts at a measured guess and tracks observed fits in this process.
+MODEL_FIT_OVERHEAD_MS = {"sarimax": 10.0, "holt_winters": 70.0, "seasonal_naive": 0.0}
+_fit_ms_per_day = {"sarimax": 1.0, "holt_winters": 0.2, "seasonal_naive": 0.0}
+
+
+def expected_fit_ms(model: str, days: int) -> float:
+    return MODEL_FIT_OVERHEAD_MS[model] + _fit_ms_per_day[model] * days
+
+
+def _record_fit_time(model: str, days: int, fit_ms: float) -> None:
+    observed = max(fit_ms - MODEL_FIT_OVERHEAD_MS[model], 0.0) / max(days, 1)
+    _fit_ms_per_day[model] = 0.7 * _fit_ms_per_day[model] + 0.3 * observed
+
+
+def forecast_with_budget(
+    daily_loads: "pd.Series",
+    steps: int = FORECAST_DAYS,
+    model: ForecastModel = "auto",
+    budget_ms: Optional[float] = None,
+) -> dict:
+    """
+    Forecasts with `model` (or the most accurate one, for `auto`) and falls back to the
+    next faster model whenever the series is too short for it, its expected fit time
+    exceeds what is left of `budget_ms`, or its fit overruns. The seasonal-naive model
+    ends every chain. Returns the forecast together with the model that answered, the
+    fit time and why a fallback happened (if it did). Raises InsufficientDataError when
+    no model has enough data.
+    """
+    names = list(MODELS)
+    chain = names if model == "auto" else names[names.index(model):]
+    days = len(daily_loads)
+    started = time.perf_counter()
+    fallback_reason = None
+
+    def run(name: str, budget_seconds: Optional[float]) -> dict:
+        fit_started = time.perf_counter()
+        try:
+            forecast = MODELS[name](daily_loads, steps, budget_seconds)
+        except FitBudgetExceeded:
+            # An abandoned fit would have taken at least this long; learn from it too.
+            _record_fit_time(name, days, (time.perf_counter() - fit_started) * 1000)
+            raise
+        fit_ms = (time.perf_counter() - fit_started) * 1000
+        _record_fit_time(name, days, fit_ms)
+        if budget_seconds is not None and fit_ms > budget_seconds * 1000:
+            # Holt-Winters can't be stopped mid-fit, so a late fit is only caught here.
+            raise FitBudgetExceeded(f"{name} took {fit_ms:.0f} ms of a {budget_seconds * 1000:.0f} ms budget.")
+        return {
+            "model": name,
+            "fit_ms": round(fit_ms, 1),
+            "horizon": steps,
+            "fallback_reason": fallback_reason,
+            "forecast": forecast,
+        }
+
+    for name in chain[:-1]:
+        if days < MODEL_MIN_HISTORY_DAYS[name]:
+            fallback_reason = fallback_reason or f"{name} needs at least {MODEL_MIN_HISTORY_DAYS[name]} days of data."
+            continue
+        remaining_ms = None if budget_ms is None else budget_ms - (time.perf_counter() - started) * 1000
+        if remaining_ms is not None and expected_fit_ms(name, days) > remaining_ms:
+            fallback_reason = fallback_reason or f"{name} would not fit within the {budget_ms:.0f} ms budget."
+            continue
+        try:
+            return run(name, None if remaining_ms is None else remaining_ms / 1000)
+        except FitBudgetExceeded:
+            fallback_reason = fallback_reason or f"{name} did not fit within the {budget_ms:.0f} ms budget."
+        except Exception as e:
+            fallback_reason = fallback_reason or f"{name} failed: {e}"
+
+    # The seasonal-naive model needs no fitting, so it always answers in time.
+    return run(chain[-1], None)
+
+
+def segment_daily_counts(rows: list[dict], by: str, top: Optional[int] = None) -> "pd.DataFrame":
+    """
+    Groups loads into segments (`by` is a key of SEGMENT_FIELDS) and counts them per day:
+    one column per segment over a shared, gap-free daily index, busiest segments first.
+    Only the `top` busiest segments are kept when it is given.
+    """
+    import pandas as pd
+
+    fields = SEGMENT_FIELDS[by]
+    df = pd.DataFrame.from_records(rows, columns=[*fields, "posted_date"])
+    df["posted_date"] = pd.to_datetime(df["posted_date"], utc=True).dt.tz_convert(None).dt.normalize()
+    df = df.dropna()
+    if df.empty:
+        return pd.DataFrame(dtype="int64")
+
+    segment = df[fields[0]].astype(str)
+    for field in fields[1:]:
+        segment = segment + " → " + df[field].astype(str)
+    counts = pd.crosstab(df["posted_date"], segment).asfreq("D", fill_value=0)
+    busiest = counts.sum().sort_values(ascending=False, kind="stable").index
+    return counts[busiest[:top] if top else busiest]
+
+
+def _forecast_segment(values: list[int], start: str, steps: int, model: ForecastModel, budget_ms: Optional[float]) -> dict:
+    """Forecasts one segment's series; runs in a forecast pool worker, so it only takes plain values."""
+    import pandas as pd
+
+    series = pd.Series(values, index=pd.date_range(start=start, periods=len(values), freq="D"))
+    try:
+        return {**forecast_with_budget(series, steps, model, budget_ms), "error": None}
+    except Exception as e:
+        return {"model": None, "fit_ms": None, "forecast": None, "error": str(e)}
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if FORECAST_POOL_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=FORECAST_POOL_WORKERS,
+                mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+            )
+        return _executor
+
+
+def shutdown_forecast_pool() -> None:
+    """Stops the forecast worker processes; a new pool is started by the next segmented forecast."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def forecast_segments(
+    counts: "pd.DataFrame",
+    steps: int = FORECAST_DAYS,
+    model: ForecastModel = "auto",
+    budget_ms: Optional[float] = FORECAST_SEGMENT_BUDGET_MS,
+) -> list[dict]:
+    """
+    Forecasts every column of `counts` (see segment_daily_counts), fitting the segments in
+    parallel across the forecast pool, each with forecast_with_budget and `budget_ms`. A
+    segment that can't be forecast, or isn't done when the budgets of all the segments
+    (spread over the workers) plus FORECAST_POOL_OVERHEAD_MS have passed, gets an `error`
+    instead of a `forecast`.
+    """
+    if counts.empty:
+        return []
+    start = counts.index[0].strftime("%Y-%m-%d")
+    jobs = [(name, counts[name].tolist()) for name in counts.columns]
+    executor = _get_executor()
+
+    if executor is None:
+        results = [_forecast_segment(values, start, steps, model, budget_ms) for _, values in jobs]
+    else:
+        futures = [executor.submit(_forecast_segment, values, start, steps, model, budget_ms) for _, values in jobs]
+        timeout = None
+        if budget_ms is not None:
+            rounds = math.ceil(len(futures) / FORECAST_POOL_WORKERS)
+            timeout = (rounds * budget_ms + FORECAST_POOL_OVERHEAD_MS) / 1000
+        _, late = wait(futures, timeout=timeout)
+        if late:
+            for future in late:
+                future.cancel()
+            # Fits still running past their budget keep their workers busy; let them
+            # finish in the old pool and start a fresh one for the next request.
+            shutdown_forecast_pool()
+        results = []
+        for future in futures:
+            if future in late:
+                results.append({"model": None, "fit_ms": None, "forecast": None, "error": f"Forecast did not finish within {timeout:.1f} s."})
+                continue
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool for the next request.
+                shutdown_forecast_pool()
+                results.append({"model": None, "fit_ms": None, "forecast": None, "error": "Forecast worker crashed."})
+
+    return [
+        {"segment": name, "loads": int(sum(values)), **result}
+        for (name, values), result in zip(jobs, results)
+    ]
@@ -0,0 +1,172 @@
+import csv
+import math
+import pathlib
+import re
+import threading
+from typing import NamedTuple, Optional
+
+# Offline geocoding of load origins/destinations and geohash helpers for radius search.
+# Everything here is pure Python, so it also works without a Firestore connection.
+
+# Bundled city gazetteer: name, state, coordinates, 3-digit PIN prefix and aliases.
+GAZETTEER_PATH = pathlib.Path(__file__).parent / "data" / "gazetteer.csv"
+
+# Mean Earth radius (IUGG), in kilometres.
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision of the geohashes stored on loads: 9 characters is a cell of about 5 x 5 m.
+GEOHASH_PRECISION = 9
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+_PIN_CODE = re.compile(r"\b(\d{3})\s?\d{3}\b")
+
+
+class Place(NamedTuple):
+    name: str
+    state: str
+    latitude: float
+    longitude: float
+
+
+class Gazetteer:
+    """City and PIN code lookup, loaded from GAZETTEER_PATH on first use."""
+
+    def __init__(self, path: pathlib.Path = GAZETTEER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_name: Optional[dict[str, Place]] = None
+        self._by_pin_prefix: dict[str, Place] = {}
+
+    def _load(self) -> dict[str, Place]:
+        with self._lock:
+            if self._by_name is None:
+                by_name = {}
+                with open(self.path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        place = Place(row["name"], row["state"], float(row["latitude"]), float(row["longitude"]))
+                        for name in [row["name"], *filter(None, row["aliases"].split("|"))]:
+                            by_name[_normalize(name)] = place
+                        if row["pin_prefix"]:
+                            self._by_pin_prefix[row["pin_prefix"]] = place
+                self._by_name = by_name
+            return self._by_name
+
+    def lookup(self, text: Optional[str]) -> Optional[Place]:
+        """
+        Resolves a free-form location such as "Mumbai, India", "Andheri, Bombay" or
+        "Pune 411001". A PIN code wins over names; otherwise the comma-separated parts
+        are tried in order. Returns None for unknown places.
+        """
+        if not text:
+            return None
+        by_name = self._by_name or self._load()
+        pin = _PIN_CODE.search(text)
+        if pin and pin.group(1) in self._by_pin_prefix:
+            return self._by_pin_prefix[pin.group(1)]
+        for part in text.split(","):
+            place = by_name.get(_normalize(_PIN_CODE.sub("", part)))
+            if place is not None:
+                return place
+        return None
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+gazetteer = Gazetteer()
+
+
+def geocode(text: Optional[str]) -> Optional[tuple[float, float]]:
+    """Returns the (latitude, longitude) of a location string, or None if it is not in the gazetteer."""
+    place = gazetteer.lookup(text)
+    return None if place is None else (place.latitude, place.longitude)
+
+
+def load_coordinates(origin: Optional[str], destination: Optional[str]) -> dict:
+    """
+    Returns the geo fields stored on a load document: origin and destination coordinates
+    and the origin geohash, each None if the place could not be geocoded.
+    """
+    origin_point = geocode(origin)
+    destination_point = geocode(destination)
+    return {
+        "origin_lat": origin_point[0] if origin_point else None,
+        "origin_lng": origin_point[1] if origin_point else None,
+        "origin_geohash": encode_geohash(*origin_point) if origin_point else None,
+        "destination_lat": destination_point[0] if destination_point else None,
+        "destination_lng": destination_point[1] if destination_point else None,
+    }
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encodes a point as a geohash; nearby points share long prefixes."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate between longitude (even) and latitude (odd).
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def _cell_size_degrees(precision: int) -> tuple[float, float]:
+    """Returns the (latitude, longitude) span of a geohash cell of `precision` characters."""
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points, in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_ranges(latitude: float, longitude: float, radius_km: float) -> list[tuple[str, str]]:
+    """
+    Returns the [start, end) geohash ranges that together cover the circle of
+    `radius_km` around a point: the cell containing it plus its 8 neighbours, at the
+    finest precision whose cells are still at least `radius_km` across. Matches still
+    need an exact distance check, but the scanned area is at most 9 such cells.
+    """
+    # Cells narrow towards the poles, so size them at the circle's most poleward latitude.
+    extreme_latitude = min(89.9, abs(latitude) + radius_km / _KM_PER_DEGREE)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        lat_span, lng_span = _cell_size_degrees(candidate)
+        if (lat_span * _KM_PER_DEGREE >= radius_km
+                and lng_span * _KM_PER_DEGREE * math.cos(math.radians(extreme_latitude)) >= radius_km):
+            precision = candidate
+            break
+
+    lat_span, lng_span = _cell_size_degrees(precision)
+    prefixes = set()
+    for d_lat in (-1, 0, 1):
+        neighbour_lat = latitude + d_lat * lat_span
+        if not -90 <= neighbour_lat <= 90:
+            continue
+        for d_lng in (-1, 0, 1):
+            neighbour_lng = (longitude + d_lng * lng_span + 180) % 360 - 180
+            prefixes.add(encode_geohash(neighbour_lat, neighbour_lng, precision))
+    # '~' sorts after every geohash character, so [prefix, prefix + '~') is the whole cell.
+    return [(prefix, prefix + "~") for prefix in sorted(prefixes)]
@@ -0,0 +1,169 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from passlib.context import CryptContext
+
+# This module is imported by the hashing worker processes, so it must stay free of
+# database and web-app imports. Workers are started by a forkserver (spawn where that
+# is unavailable) rather than forked from the API process, whose gRPC channels and
+# listener threads may hold locks a forked child would inherit and deadlock on.
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# --- bcrypt Configuration ---
+# Hashes made with any other cost are flagged by `needs_update` and transparently
+# rehashed on the next successful login, so the cost can be tuned in either direction.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# --- Hashing Pool Configuration ---
+# bcrypt only partly releases the GIL, so hashing runs in a separate process pool
+# instead of the shared request threadpool. 0 workers runs hashing in the threadpool.
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Maximum number of hashing jobs queued or running before new ones are rejected.
+HASH_POOL_MAX_PENDING = int(os.getenv("HASH_POOL_MAX_PENDING", "64"))
+# Workers lower their CPU priority by this much, so under a login flood bcrypt only gets
+# the CPU the API processes leave over (on top of being capped at HASH_POOL_WORKERS cores).
+HASH_POOL_NICE = int(os.getenv("HASH_POOL_NICE", "10"))
+
+# Initialize the password context, specifying bcrypt as the scheme
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain password against a hashed password."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    """Hashes a plain password."""
+    return pwd_context.hash(password)
+
+def verify_and_rehash(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies a plain password and, if the stored hash was made with outdated settings,
+    returns a fresh hash to store in its place. Returns (is_valid, new_hash_or_None).
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+
+def _lower_priority() -> None:
+    """Hashing worker initializer: applies HASH_POOL_NICE where the OS supports it."""
+    if HASH_POOL_NICE and hasattr(os, "nice"):
+        os.nice(HASH_POOL_NICE)
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool already has HASH_POOL_MAX_PENDING jobs."""
+
+
+class HashingPool:
+    """
+    A bounded process pool for password hashing, with its own queue limit and metrics.
+    The executor is created on first use.
+    """
+
+    def __init__(self, max_workers: int = HASH_POOL_WORKERS, max_pending: int = HASH_POOL_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                    initializer=_lower_priority,
+                )
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def run(self, func, *args):
+        """
+        Runs `func(*args)` in the pool and returns its result.
+        Raises HashingPoolBusy instead of queueing beyond `max_pending` jobs.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingPoolBusy()
+            self.pending += 1
+
+        started = time.perf_counter()
+        try:
+            result = await self._submit(func, *args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.busy_seconds += time.perf_counter() - started
+
+    async def _submit(self, func, *args):
+        if self.max_workers <= 0:
+            # Only the API process gets here, so the web framework is imported on demand.
+            from fastapi.concurrency import run_in_threadpool
+            return await run_in_threadpool(func, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next jobs.
+            self._reset_executor()
+            raise
+
+    def stats(self) -> dict:
+        """Returns the pool's queue and throughput counters."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "busy_seconds": self.busy_seconds,
+            }
+
+    def shutdown(self) -> None:
+        """Stops the worker processes; a new pool is started if hashing is used again."""
+        self._reset_executor()
+
+
+hashing_pool = HashingPool()
+
+async def hash_password_async(password: str) -> str:
+    """Hashes a plain password in the hashing pool."""
+    return await hashing_pool.run(get_password_hash, password)
+
+async def verify_and_rehash_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Runs `verify_and_rehash` in the hashing pool."""
+    return await hashing_pool.run(verify_and_rehash, plain_password, hashed_password)
@@ -0,0 +1,306 @@
+import asyncio
+import bisect
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import NamedTuple, Optional
+from google.cloud.firestore_v1.base_query import FieldFilter
+from backend.models import LoadRead
+
+# Serve /loads/available from an in-process index kept current by a Firestore
+# snapshot listener, instead of querying Firestore on every poll.
+LOAD_BOARD_ENABLED = os.getenv("LOAD_BOARD_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Maximum number of undelivered update batches per streaming subscriber. A client that
+# falls further behind is disconnected and has to reconnect for a fresh snapshot.
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("LOAD_BOARD_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+# How often the snapshot listener is checked. A listener that died (stream error, lost
+# permissions) empties the board, so requests fall back to Firestore, and is restarted.
+LOAD_BOARD_CHECK_SECONDS = float(os.getenv("LOAD_BOARD_CHECK_SECONDS", "5"))
+
+
+class BoardEntry(NamedTuple):
+    """Compact in-memory record of a stand-by load."""
+    id: str
+    origin: str
+    destination: str
+    material_type: str
+    weight: int
+    order_description: Optional[str]
+    shipper_id: str
+    loader_id: Optional[str]
+    status: str
+    posted_date: datetime
+    origin_lat: Optional[float] = None
+    origin_lng: Optional[float] = None
+    origin_geohash: Optional[str] = None
+    destination_lat: Optional[float] = None
+    destination_lng: Optional[float] = None
+
+    @classmethod
+    def from_snapshot(cls, doc) -> "BoardEntry":
+        data = doc.to_dict()
+        return cls(
+            id=doc.id,
+            origin=data.get("origin"),
+            destination=data.get("destination"),
+            material_type=data.get("material_type"),
+            weight=data.get("weight"),
+            order_description=data.get("order_description"),
+            shipper_id=data.get("shipper_id"),
+            loader_id=data.get("loader_id"),
+            status=data.get("status"),
+            posted_date=data.get("posted_date"),
+            origin_lat=data.get("origin_lat"),
+            origin_lng=data.get("origin_lng"),
+            origin_geohash=data.get("origin_geohash"),
+            destination_lat=data.get("destination_lat"),
+            destination_lng=data.get("destination_lng"),
+        )
+
+
+class LoadBoard:
+    """
+    In-memory index of stand-by loads, by ID, by origin, destination and material_type,
+    and by origin geohash for radius searches.
+
+    An `on_snapshot` listener on the stand-by query applies every change Firestore
+    reports: loads that are posted are added, loads that are accepted or otherwise
+    leave 'stand by' are removed. The listener runs on a background thread, so all
+    access goes through a lock. Another thread restarts the listener if it stops.
+    """
+
+    _INDEXED_FIELDS = ("origin", "destination", "material_type")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, BoardEntry] = {}
+        self._sorted_ids: list[str] = []
+        self._indexes = {field: defaultdict(set) for field in self._INDEXED_FIELDS}
+        # Sorted (origin_geohash, id) pairs of the geocoded loads.
+        self._geohashes: list[tuple[str, str]] = []
+        self._watch = None
+        self._query = None
+        self._stopped = threading.Event()
+        self.restarts = 0
+        self.ready = threading.Event()
+        # Incremented on every applied change, so readers can tell when the board moved.
+        self.version = 0
+        # Streaming clients, all served from the event loop they subscribed on.
+        self._subscribers: set["Subscription"] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, client) -> None:
+        """
+        Subscribes to the stand-by loads query and starts watching the listener. The board
+        is `ready` after the first snapshot.
+        """
+        self._query = client.collection('loads').where(filter=FieldFilter('status', '==', 'stand by'))
+        self._stopped.clear()
+        self._watch = self._query.on_snapshot(self._on_snapshot)
+        threading.Thread(target=self._supervise, name="load-board-supervisor", daemon=True).start()
+
+    def stop(self) -> None:
+        """Unsubscribes the listener and empties the board."""
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._reset()
+
+    def _supervise(self) -> None:
+        while not self._stopped.wait(LOAD_BOARD_CHECK_SECONDS):
+            self.check_listener()
+
+    def check_listener(self) -> None:
+        """
+        Restarts the snapshot listener if it has stopped. Until its first snapshot arrives
+        the board is not `ready`, so requests are served from Firestore meanwhile.
+        """
+        if self._query is None or self._stopped.is_set():
+            return
+        if self._watch is not None and self._watch.is_active:
+            return
+        print("⚠️ Load board listener stopped; serving from Firestore until it is restarted.")
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._reset()
+        try:
+            self._watch = self._query.on_snapshot(self._on_snapshot)
+            self.restarts += 1
+        except Exception as e:
+            # Tried again on the next check.
+            print(f"🔥 Failed to restart the load board listener: {e}")
+
+    def _reset(self) -> None:
+        """Marks the board not ready, ends every stream and empties the board."""
+        self.ready.clear()
+        for subscription in list(self._subscribers):
+            try:
+                self._loop.call_soon_threadsafe(self._close, subscription)
+            except RuntimeError:
+                # The event loop is already closed, so is the stream.
+                self.unsubscribe(subscription)
+        with self._lock:
+            self._entries.clear()
+            self._sorted_ids.clear()
+            self._geohashes.clear()
+            for index in self._indexes.values():
+                index.clear()
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        deltas = []
+        with self._lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    self._remove(change.document.id)
+                    deltas.append(("removed", change.document.id))
+                else:
+                    entry = BoardEntry.from_snapshot(change.document)
+                    self._upsert(entry)
+                    deltas.append(("added" if change.type.name == "ADDED" else "updated", entry))
+            self.version += 1
+            version = self.version
+            loop = self._loop if self._subscribers else None
+        self.ready.set()
+
+        if loop is not None and deltas:
+            # Encode each delta once, however many clients receive it, and hand the
+            # batch to the event loop in a single thread-safe call.
+            frames = [
+                sse_frame(event, json.dumps({"id": payload}) if event == "removed" else encode_entry(payload), version)
+                for event, payload in deltas
+            ]
+            loop.call_soon_threadsafe(self._fan_out, version, frames)
+
+    def _fan_out(self, version: int, frames: list[bytes]) -> None:
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait((version, frames))
+            except asyncio.QueueFull:
+                # Too slow to keep up: the client has to reconnect for a fresh snapshot.
+                self._close(subscription)
+
+    def _close(self, subscription: "Subscription") -> None:
+        """Drops a subscriber's backlog and tells its stream to end. Runs on the event loop."""
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def subscribe(self) -> tuple["Subscription", list[BoardEntry], int]:
+        """
+        Registers a streaming client. Must be called from the event loop.
+        Returns the subscription with a consistent snapshot of the board and its version;
+        queued updates at or below that version are already reflected in the snapshot.
+        """
+        subscription = Subscription()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(subscription)
+            entries = [self._entries[load_id] for load_id in self._sorted_ids]
+            return subscription, entries, self.version
+
+    def unsubscribe(self, subscription: "Subscription") -> None:
+        subscription.closed = True
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _upsert(self, entry: BoardEntry) -> None:
+        if entry.id in self._entries:
+            self._remove(entry.id)
+        self._entries[entry.id] = entry
+        bisect.insort(self._sorted_ids, entry.id)
+        for field in self._INDEXED_FIELDS:
+            self._indexes[field][getattr(entry, field)].add(entry.id)
+        if entry.origin_geohash:
+            bisect.insort(self._geohashes, (entry.origin_geohash, entry.id))
+
+    def _remove(self, load_id: str) -> None:
+        entry = self._entries.pop(load_id, None)
+        if entry is None:
+            return
+        del self._sorted_ids[bisect.bisect_left(self._sorted_ids, load_id)]
+        if entry.origin_geohash:
+            del self._geohashes[bisect.bisect_left(self._geohashes, (entry.origin_geohash, load_id))]
+        for field in self._INDEXED_FIELDS:
+            ids = self._indexes[field].get(getattr(entry, field))
+            if ids is not None:
+                ids.discard(load_id)
+                if not ids:
+                    del self._indexes[field][getattr(entry, field)]
+
+    def query(
+        self,
+        origin: Optional[str] = None,
+        destination: Optional[str] = None,
+        material_type: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> list[BoardEntry]:
+        """
+        Returns the stand-by loads matching every given filter (exact match), ordered by ID.
+        `cursor` and `limit` page through the result the same way the Firestore path does.
+        """
+        filters = {"origin": origin, "destination": destination, "material_type": material_type}
+        with self._lock:
+            candidate_sets = [
+                self._indexes[field].get(value, set())
+                for field, value in filters.items() if value is not None
+            ]
+            if candidate_sets:
+                ids = sorted(set.intersection(*sorted(candidate_sets, key=len)))
+            else:
+                ids = self._sorted_ids
+
+            start = bisect.bisect_right(ids, cursor) if cursor else 0
+            end = len(ids) if limit is None else start + limit
+            return [self._entries[load_id] for load_id in ids[start:end]]
+
+    def in_geohash_ranges(self, ranges: list[tuple[str, str]]) -> list[BoardEntry]:
+        """Returns the loads whose origin geohash falls in any of the [start, end) ranges."""
+        with self._lock:
+            entries = []
+            for start, end in ranges:
+                position = bisect.bisect_left(self._geohashes, (start, ""))
+                while position < len(self._geohashes) and self._geohashes[position][0] < end:
+                    entries.append(self._entries[self._geohashes[position][1]])
+                    position += 1
+            return entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Subscription:
+    """A streaming client's queue of pending (version, frames) update batches."""
+
+    __slots__ = ("queue", "closed")
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+
+def encode_entry(entry: BoardEntry) -> str:
+    """Serializes a board entry exactly like the `LoadRead` responses of the REST endpoints."""
+    return LoadRead.model_validate(entry._asdict()).model_dump_json()
+
+
+def sse_frame(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    """Encodes one Server-Sent Events frame."""
+    frame = f"event: {event}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return (frame + f"data: {data}\n\n").encode()
+
+
+load_board = LoadBoard()
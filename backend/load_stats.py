@@ -0,0 +1,87 @@
+from collections import Counter
+from datetime import datetime, timezone
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.transforms import Increment
+
+# One document per UTC day, keyed 'YYYY-MM-DD', holding the number of loads posted that day.
+# Document IDs sort chronologically, so the series can be read in order by ID.
+DAILY_COUNTS_COLLECTION = "load_daily_counts"
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_SIZE = 500
+
+
+def day_key(posted_date: datetime) -> str:
+    """Returns the UTC day a load was posted on, as used for counter document IDs."""
+    if posted_date.tzinfo is not None:
+        posted_date = posted_date.astimezone(timezone.utc)
+    return posted_date.strftime('%Y-%m-%d')
+
+
+def day_increment(key: str, amount: int = 1) -> dict:
+    """Returns the merge payload that atomically adds `amount` loads to the counter of day `key`."""
+    return {"date": key, "count": Increment(amount)}
+
+
+def counter_increment(posted_date: datetime, amount: int = 1) -> tuple[str, dict]:
+    """
+    Returns the counter document ID and the merge payload that atomically adds
+    `amount` loads to the day of `posted_date`.
+    """
+    key = day_key(posted_date)
+    return key, day_increment(key, amount)
+
+
+def read_daily_counts(client) -> dict[str, int]:
+    """Reads the whole daily counter series as {'YYYY-MM-DD': count}. Costs one read per day."""
+    return {
+        doc.id: doc.to_dict().get("count", 0)
+        for doc in client.collection(DAILY_COUNTS_COLLECTION).order_by('__name__').stream()
+    }
+
+
+def latest_daily_count(client) -> tuple[str, int] | None:
+    """Returns the most recent (day, count) pair with a single document read."""
+    docs = list(
+        client.collection(DAILY_COUNTS_COLLECTION)
+        .order_by('__name__', direction='DESCENDING')
+        .limit(1)
+        .stream()
+    )
+    if not docs:
+        return None
+    return docs[0].id, docs[0].to_dict().get("count", 0)
+
+
+def read_posted_loads(client, fields: tuple[str, ...], since: datetime) -> list[dict]:
+    """
+    Reads `fields` and `posted_date` of every load posted since `since`, for segmented
+    forecasts. Costs one read per load, so keep the window short.
+    """
+    query = client.collection('loads') \
+        .where(filter=FieldFilter('posted_date', '>=', since)) \
+        .select([*fields, 'posted_date'])
+    return [doc.to_dict() for doc in query.stream()]
+
+
+def backfill_daily_counts(client) -> dict[str, int]:
+    """
+    Rebuilds the daily counter series from every document in the 'loads' collection.
+    Existing counters are overwritten with exact counts. Returns the computed series.
+    """
+    counts = Counter()
+    for doc in client.collection('loads').select(['posted_date']).stream():
+        posted_date = doc.to_dict().get('posted_date')
+        if posted_date:
+            counts[day_key(posted_date)] += 1
+
+    batch = client.batch()
+    for key, count in sorted(counts.items()):
+        batch.set(client.collection(DAILY_COUNTS_COLLECTION).document(key), {"date": key, "count": count})
+        if len(batch) >= MAX_BATCH_SIZE:
+            batch.commit()
+            batch = client.batch()
+    if len(batch):
+        batch.commit()
+
+    return dict(counts)
@@ -1,18 +1,52 @@
-from dotenv import load_dotenv
-import os
-import pathlib
+# Time the app's imports first, so the startup diagnostic covers every import below
+from backend.diagnostics import import_timer, startup_timings
+import_timer.start()
 
-# Explicitly find the .env file in the project root, which is one level above the 'backend' directory
-project_root = pathlib.Path(__file__).parent.parent
-dotenv_path = project_root / ".env"
-load_dotenv(dotenv_path=dotenv_path)
+try:
+    from dotenv import load_dotenv
+    import os
+    import pathlib
+    import time
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import auth, loads, predictions, users, my_collection
-from backend import database
+    # Explicitly find the .env file in the project root, which is one level above the 'backend' directory
+    project_root = pathlib.Path(__file__).parent.parent
+    dotenv_path = project_root / ".env"
+    load_dotenv(dotenv_path=dotenv_path)
 
-app = FastAPI()
+    import asyncio
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import PlainTextResponse
+    from backend.routers import auth, loads, predictions, users, my_collection
+    from backend import database
+    from backend.hashing import hashing_pool
+    from backend.forecasting import shutdown_forecast_pool
+    from backend.load_board import LOAD_BOARD_ENABLED, load_board
+    from backend.metrics import MetricsMiddleware, render_gauges, render_request_metrics
+    from backend.security import user_cache, token_memo
+    from backend.rate_limit import login_limiter
+finally:
+    # Restore the real __import__ even if an import above fails.
+    import_timer.stop()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if LOAD_BOARD_ENABLED and database.db is not None:
+        # Keep the stand-by loads in memory, fed by a Firestore snapshot listener
+        load_board.start(database.db)
+    elif database.db is not None:
+        # Create the Firestore client in the background instead of on the first request
+        asyncio.get_running_loop().run_in_executor(None, database.warm_up)
+    startup_timings["lifespan_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    yield
+    load_board.stop()
+    # Stop the password hashing worker processes
+    hashing_pool.shutdown()
+    shutdown_forecast_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS (Cross-Origin Resource Sharing)
 # It's better to control this via an environment variable
@@ -26,14 +60,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Added last so it is the outermost middleware and its timings include CORS handling
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router)
-app.include_router(loads.router, prefix="/loads", tags=["Loads"])
+app.include_router(loads.router)
 app.include_router(predictions.router)
 app.include_router(users.router)
 app.include_router(my_collection.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to TruckMitraAI API"}
\ No newline at end of file
+    return {"message": "Welcome to TruckMitraAI API"}
+
+@app.get("/diagnostics/startup", include_in_schema=False)
+def startup_diagnostics():
+    """How long the worker took to import the app (slowest imports first) and to run its startup hook."""
+    return {"imports": import_timer.report(), **startup_timings}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Request latency, status codes and threadpool usage, plus the cache, hashing pool,
+    load acceptance and load board counters, in the Prometheus text format.
+    """
+    lines = render_request_metrics()
+    lines += render_gauges("user_cache", user_cache.stats(), "User document cache statistics.")
+    lines += render_gauges("token_memo", token_memo.stats(), "Decoded access token memo statistics.")
+    lines += render_gauges("load_list_cache", loads.load_list_cache.stats(), "Per-user load list cache statistics.")
+    lines += render_gauges("hashing_pool", hashing_pool.stats(), "Password hashing pool statistics.")
+    lines += render_gauges("login_rate_limit", login_limiter.stats(), "Login attempts allowed and throttled.")
+    lines += render_gauges("load_accept", dict(loads.accept_stats), "Load acceptance attempts, conflicts and retries.")
+    lines += render_gauges("load_board", {
+        "ready": int(load_board.ready.is_set()),
+        "entries": len(load_board),
+        "subscribers": load_board.subscriber_count,
+        "listener_restarts": load_board.restarts,
+    }, "In-memory load board state.")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
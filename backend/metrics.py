@@ -0,0 +1,222 @@
+import bisect
+import time
+from collections import defaultdict
+
+import anyio.to_thread
+
+from backend.database import FIRESTORE_DEBUG_HEADERS, FirestoreUsage, firestore_usage
+
+# Request metrics, rendered in the Prometheus text exposition format at /metrics.
+# The middleware runs on the event loop thread only, so the counters need no locks.
+
+# Latency histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for requests that did not match any route, so random paths can't blow up cardinality.
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Responses of these media types are streams that can stay open for minutes: they are
+# timed to their first byte, and counted as open streams rather than requests in flight.
+STREAMING_MEDIA_TYPES = (b"text/event-stream", b"application/x-ndjson")
+
+
+class Histogram:
+    """A labelled histogram with fixed buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # Per-bucket counts (plus +Inf), running sum and total count.
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, name: str, label_names: tuple) -> list[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            base = _format_labels(label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{base}}} {total}')
+            lines.append(f'{name}_count{{{base}}} {count}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Per-route latency histograms (streams get their own, to the first byte), response
+    status counters, the in-flight and open stream gauges and per-route Firestore totals
+    ([calls, reads, writes, seconds]).
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.stream_latency = Histogram()
+        self.responses = defaultdict(int)
+        self.firestore = defaultdict(lambda: [0, 0, 0, 0.0])
+        self.in_flight = 0
+        self.streams_open = 0
+
+    def reset(self) -> None:
+        self.latency = Histogram()
+        self.stream_latency = Histogram()
+        self.responses.clear()
+        self.firestore.clear()
+        self.in_flight = 0
+        self.streams_open = 0
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request. Requests are labelled with the
+    route template (e.g. `/loads/{load_id}/accept`) rather than the raw path. A request
+    is timed until its last response byte is sent, so background tasks that run after
+    the response don't count; streaming responses are timed until their first byte.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics, debug_headers: bool = FIRESTORE_DEBUG_HEADERS):
+        self.app = app
+        self.metrics = metrics
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status_code = 500
+        streaming = False
+        finished = False
+        usage = FirestoreUsage()
+        token = firestore_usage.set(usage)
+
+        def finish():
+            # Records the response once, when it is complete (or, for a stream, has started).
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            labels = (scope["method"], _route_label(scope))
+            if streaming:
+                metrics.streams_open += 1
+                metrics.stream_latency.observe(labels, elapsed)
+            else:
+                metrics.latency.observe(labels, elapsed)
+            metrics.responses[(*labels, str(status_code))] += 1
+
+        async def send_wrapper(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", ())).get(b"content-type", b"")
+                streaming = content_type.startswith(STREAMING_MEDIA_TYPES)
+                if self.debug_headers:
+                    # Streaming responses only report the work done before their first chunk.
+                    message["headers"] = [*message.get("headers", ()), *usage.headers()]
+                await send(message)
+                if streaming:
+                    finish()
+                return
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Covers requests that failed or were disconnected before their last byte.
+            finish()
+            if streaming:
+                metrics.streams_open -= 1
+            firestore_usage.reset(token)
+            if usage.calls:
+                totals = metrics.firestore[(scope["method"], _route_label(scope))]
+                totals[0] += usage.calls
+                totals[1] += usage.reads
+                totals[2] += usage.writes
+                totals[3] += usage.seconds
+
+
+def _route_label(scope) -> str:
+    # Every router is created with its prefix, so a route's path is its full template.
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def render_gauges(prefix: str, stats: dict, help_text: str) -> list[str]:
+    """Renders the numeric values of a stats dict as `<prefix>_<key>` gauges."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f"{prefix}_{key}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return lines
+
+
+def render_request_metrics(metrics: RequestMetrics = request_metrics) -> list[str]:
+    """Renders the request metrics and the threadpool gauges. Must run on the event loop."""
+    lines = [
+        "# HELP http_request_duration_seconds HTTP request latency by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+        *metrics.latency.render("http_request_duration_seconds", ("method", "route")),
+        "# HELP http_responses_total HTTP responses by route template and status code.",
+        "# TYPE http_responses_total counter",
+    ]
+    for labels, count in sorted(metrics.responses.items()):
+        lines.append(f"http_responses_total{{{_format_labels(('method', 'route', 'status'), labels)}}} {count}")
+    for index, (name, help_text) in enumerate((
+        ("firestore_calls_total", "Firestore client calls by route template."),
+        ("firestore_reads_total", "Firestore document reads by route template."),
+        ("firestore_writes_total", "Firestore document writes by route template."),
+        ("firestore_seconds_total", "Time spent waiting on Firestore by route template."),
+    )):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for labels, totals in sorted(metrics.firestore.items()):
+            lines.append(f"{name}{{{_format_labels(('method', 'route'), labels)}}} {totals[index]}")
+    lines += [
+        "# HELP http_stream_first_byte_seconds Time to the first byte of streaming responses by route template.",
+        "# TYPE http_stream_first_byte_seconds histogram",
+        *metrics.stream_latency.render("http_stream_first_byte_seconds", ("method", "route")),
+        "# HELP http_requests_in_flight HTTP requests currently being served, excluding open streams.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {metrics.in_flight}",
+        "# HELP http_streams_open Streaming responses currently open.",
+        "# TYPE http_streams_open gauge",
+        f"http_streams_open {metrics.streams_open}",
+    ]
+
+    # Sync handlers and run_in_threadpool share anyio's default thread limiter.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    lines += render_gauges("threadpool", {
+        "threads_total": limiter.total_tokens,
+        "threads_busy": statistics.borrowed_tokens,
+        "queue_depth": statistics.tasks_waiting,
+    }, "Request threadpool capacity, busy threads and tasks waiting for a thread.")
+    return lines
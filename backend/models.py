@@ -25,6 +25,12 @@ class UserRead(BaseModel):
     role: str
     user_name: Optional[str] = None
 
+class TokenPrincipal(BaseModel):
+    """Identity carried by a verified access token, trusted without a database lookup."""
+    email: EmailStr
+    role: str
+    user_name: Optional[str] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -50,17 +56,76 @@ class LoadCreateResponse(BaseModel):
     load_id: str
     message: str
 
+class BulkLoadResult(BaseModel):
+    """Outcome of one load of a bulk upload; `row` is its 1-based position in the upload."""
+    row: int
+    load_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkLoadResponse(BaseModel):
+    """Model for the response after a bulk upload: totals plus a result per load."""
+    created: int
+    failed: int
+    results: list[BulkLoadResult]
+
+class LoadTransition(BaseModel):
+    """One status change of a batch: `accept`, `deliver`, or set `status` (the default action)."""
+    load_id: str
+    action: Literal["accept", "deliver", "status"] = "status"
+    status: Optional[str] = None  # The new status, for the `status` action
+
+class LoadTransitionBatch(BaseModel):
+    """Model for a batch of status changes; at most 500, Firestore's batched write limit."""
+    items: list[LoadTransition] = Field(..., min_length=1, max_length=500)
+
+class LoadTransitionResult(BaseModel):
+    """Outcome of one status change: the load's new status, or the error and its HTTP status code."""
+    load_id: str
+    status: Optional[str] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+class LoadTransitionBatchResponse(BaseModel):
+    """Model for the response to a batch of status changes, in request order."""
+    succeeded: int
+    failed: int
+    results: list[LoadTransitionResult]
+
 class Load(LoadBase):
     """Model for load data stored in the database."""
     id: str  # Unique identifier for the load
     shipper_id: str  # ID of the shipper posting the load
     status: Literal["transit", "stand by", "delivered"] = Field(..., description="Load status: transit, stand by, or delivered")
     posted_date: datetime  # Date when the load was posted
+    # Geocoded from origin/destination against the bundled gazetteer when the load is posted;
+    # None for unknown places and for loads posted before geocoding existed.
+    origin_lat: Optional[float] = None
+    origin_lng: Optional[float] = None
+    origin_geohash: Optional[str] = None
+    destination_lat: Optional[float] = None
+    destination_lng: Optional[float] = None
 
 class LoadRead(Load): 
     """Model for reading load data."""
     pass
 
+class LoadNearby(LoadRead):
+    """A load returned by a radius search, with its origin's distance from the search point."""
+    distance_km: float
+
+class LoadRecommendation(LoadRead):
+    """A load ranked for a driver by /loads/recommended; higher scores are better matches."""
+    score: float
+    distance_km: Optional[float] = None
+
+class LoadSummary(BaseModel):
+    """Slim model for list views (`view=summary`): just what a load card shows."""
+    id: str
+    origin: str
+    destination: str
+    weight: int
+    status: Literal["transit", "stand by", "delivered"]
+
 # --- MyCollection Models ---
 
 class MyCollectionBase(BaseModel):
@@ -0,0 +1,120 @@
+import math
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+# Token-bucket rate limiting for expensive endpoints (password logins). Buckets live in a
+# backend: in-process by default, or a shared store (e.g. Redis) when the API runs as
+# several workers, by implementing RateLimitBackend.
+
+# Login attempts allowed per client IP and per username: a sustained rate per minute and
+# the burst that may be spent at once.
+AUTH_IP_RATE_PER_MINUTE = float(os.getenv("AUTH_IP_RATE_PER_MINUTE", "30"))
+AUTH_IP_BURST = float(os.getenv("AUTH_IP_BURST", "10"))
+AUTH_USER_RATE_PER_MINUTE = float(os.getenv("AUTH_USER_RATE_PER_MINUTE", "6"))
+AUTH_USER_BURST = float(os.getenv("AUTH_USER_BURST", "5"))
+
+# Upper bound on the buckets kept in memory; the least recently used ones are dropped.
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets. Implementations must update a bucket atomically."""
+
+    @abstractmethod
+    async def take(self, key: str, rate_per_second: float, burst: float) -> float:
+        """
+        Takes one token from the bucket `key`, which refills at `rate_per_second` up to
+        `burst` tokens (new buckets start full). Returns 0 if a token was taken, otherwise
+        the seconds until one will be available.
+        """
+
+    @abstractmethod
+    async def reset(self) -> None:
+        """Drops every bucket."""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Buckets in a process-local LRU dict: each worker process limits on its own."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time they were counted at)
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate_per_second: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate_per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate_per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    async def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginRateLimiter:
+    """
+    Throttles login attempts per client IP and per username, so neither one noisy client
+    nor a credential-stuffing run against one account can keep the hashing pool busy.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[RateLimitBackend] = None,
+        ip_rate_per_minute: float = AUTH_IP_RATE_PER_MINUTE,
+        ip_burst: float = AUTH_IP_BURST,
+        user_rate_per_minute: float = AUTH_USER_RATE_PER_MINUTE,
+        user_burst: float = AUTH_USER_BURST,
+    ):
+        self.backend = backend if backend is not None else InMemoryRateLimitBackend()
+        self.limits = {
+            "ip": (ip_rate_per_minute / 60, ip_burst),
+            "user": (user_rate_per_minute / 60, user_burst),
+        }
+        self.counts = Counter()
+
+    async def check(self, client_ip: Optional[str], username: str) -> Optional[int]:
+        """
+        Spends one attempt of the client's bucket, then of the username's. Returns None if
+        the attempt may proceed, otherwise the Retry-After seconds. A client that is already
+        throttled doesn't spend the username's attempts, so it can't lock the real user out.
+        """
+        keys = {"ip": client_ip or "unknown", "user": username.strip().lower()}
+        for kind, value in keys.items():
+            rate, burst = self.limits[kind]
+            if rate <= 0:
+                continue
+            wait = await self.backend.take(f"login:{kind}:{value}", rate, burst)
+            if wait > 0:
+                self.counts["throttled"] += 1
+                return max(1, math.ceil(wait))
+        self.counts["allowed"] += 1
+        return None
+
+    async def reset(self) -> None:
+        await self.backend.reset()
+        self.counts.clear()
+
+    def stats(self) -> dict:
+        return {"allowed": self.counts["allowed"], "throttled": self.counts["throttled"]}
+
+
+login_limiter = LoginRateLimiter()
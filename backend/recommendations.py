@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, Sequence
+
+import numpy as np
+
+from backend.geo import EARTH_RADIUS_KM
+
+# Ranks stand-by loads for a driver in one vectorized pass over a columnar snapshot of
+# the candidates. NumPy takes a while to import, so routers import this module lazily.
+
+# How much each part of the score counts; each part is scaled to [0, 1].
+DISTANCE_WEIGHT = 0.5
+CAPACITY_WEIGHT = 0.3
+FRESHNESS_WEIGHT = 0.2
+
+# The distance score halves every ~70 km (e-folding at 100 km) between driver and origin,
+# and the freshness score e-folds every 48 hours since the load was posted.
+DISTANCE_SCALE_KM = 100.0
+FRESHNESS_SCALE_HOURS = 48.0
+
+# Candidate columns are rebuilt at most this often; the board may change much faster.
+RECOMMEND_REFRESH_SECONDS = float(os.getenv("RECOMMEND_REFRESH_SECONDS", "5"))
+
+
+class LoadColumns:
+    """
+    Columnar, array-backed copy of the candidate loads: one NumPy array per scored
+    attribute, plus the load board entries to build responses from. Immutable once built.
+    """
+
+    def __init__(self, entries: Sequence[tuple]):
+        """`entries` are load board entries (named tuples of load fields), transposed column by column."""
+        self.entries = entries
+        fields = dict(zip(entries[0]._fields, zip(*entries))) if entries else {}
+        # Missing coordinates and weights become NaN; NaN weights count as 0.
+        self.origin_lat = np.array(fields.get("origin_lat", ()), dtype=float)
+        self.origin_lng = np.array(fields.get("origin_lng", ()), dtype=float)
+        self.weight = np.nan_to_num(np.array(fields.get("weight", ()), dtype=float))
+        self.posted_at = np.array([
+            posted_date.timestamp() if isinstance(posted_date, datetime) else 0.0
+            for posted_date in fields.get("posted_date", ())
+        ], dtype=float)
+        names, codes = np.unique(
+            np.array([material or "" for material in fields.get("material_type", ())], dtype=str),
+            return_inverse=True,
+        )
+        self.material_codes: dict[str, int] = {str(name): code for code, name in enumerate(names)}
+        self.material = codes.astype(np.int32)
+
+    def row(self, index: int) -> dict:
+        return self.entries[index]._asdict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def score_loads(
+    columns: LoadColumns,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    capacity_kg: Optional[float] = None,
+    materials: Optional[set[str]] = None,
+    now: Optional[float] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scores every candidate for a driver. Returns (scores, distances in km); loads that
+    are heavier than `capacity_kg` or not one of `materials` score -inf. Without a
+    location the distance part is 0 for every load, and so on for capacity.
+    """
+    now = time.time() if now is None else now
+    scores = np.zeros(len(columns))
+    distances = np.full(len(columns), np.nan)
+
+    if lat is not None and lng is not None:
+        phi1 = np.radians(lat)
+        phi2 = np.radians(columns.origin_lat)
+        half_d_phi = (phi2 - phi1) / 2
+        half_d_lambda = np.radians(columns.origin_lng - lng) / 2
+        a = np.sin(half_d_phi) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(half_d_lambda) ** 2
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        # Loads without coordinates get no distance credit (NaN -> 0).
+        scores += DISTANCE_WEIGHT * np.nan_to_num(np.exp(-distances / DISTANCE_SCALE_KM))
+
+    if capacity_kg:
+        utilization = columns.weight / capacity_kg
+        scores += CAPACITY_WEIGHT * np.where(utilization <= 1.0, utilization, -np.inf)
+
+    age_hours = np.maximum(now - columns.posted_at, 0) / 3600
+    scores += FRESHNESS_WEIGHT * np.exp(-age_hours / FRESHNESS_SCALE_HOURS)
+
+    if materials:
+        codes = [columns.material_codes[material] for material in materials if material in columns.material_codes]
+        scores[~np.isin(columns.material, codes)] = -np.inf
+
+    return scores, distances
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest finite scores, best first, by partial sort (O(n + k log k))."""
+    eligible = np.flatnonzero(np.isfinite(scores))
+    if len(eligible) > k:
+        eligible = eligible[np.argpartition(-scores[eligible], k - 1)[:k]]
+    return eligible[np.argsort(-scores[eligible], kind="stable")]
+
+
+class CandidateCache:
+    """
+    Holds the LoadColumns of the current candidates. They are considered fresh while
+    `version` (the load board's) is unchanged, and for RECOMMEND_REFRESH_SECONDS after a
+    build either way, so a busy board is not re-columnized on every request.
+    Only one build runs at a time: meanwhile the other callers keep using the previous
+    columns or, when there are none yet, wait for that build.
+    """
+
+    def __init__(self, refresh_seconds: float = RECOMMEND_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.columns: Optional[LoadColumns] = None
+        self.version = None
+        self.built_at = 0.0
+        self._building: Optional[asyncio.Future] = None
+        self._lock = threading.Lock()
+
+    async def get(self, version, build: Callable[[], Awaitable[LoadColumns]]) -> LoadColumns:
+        """
+        Returns the current columns, awaiting `build` (which should end with `store`) when
+        they are stale and no other caller is rebuilding them yet.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            columns = self.columns
+            if columns is not None and (
+                (version is not None and version == self.version)
+                or time.monotonic() - self.built_at < self.refresh_seconds
+            ):
+                return columns
+            building = self._building
+            # A build started on another event loop can't be awaited from this one.
+            waiting = building is not None and building.get_loop() is loop
+            if waiting and columns is not None:
+                return columns
+            if not waiting:
+                building = self._building = loop.create_future()
+
+        if waiting:
+            # Shielded, so a waiter that gives up doesn't cancel the build for everyone.
+            return await asyncio.shield(building)
+        try:
+            columns = await build()
+        except Exception as e:
+            building.set_exception(e)
+            building.exception()  # Marks it retrieved, so asyncio doesn't log it when nobody waits.
+            raise
+        except BaseException:
+            building.cancel()
+            raise
+        else:
+            building.set_result(columns)
+            return columns
+        finally:
+            with self._lock:
+                if self._building is building:
+                    self._building = None
+
+    def store(self, version, entries: Sequence[tuple]) -> LoadColumns:
+        """Builds the columns of board `entries` and makes them current. CPU-bound: run it off the event loop."""
+        columns = LoadColumns(entries)
+        with self._lock:
+            self.columns = columns
+            self.version = version
+            self.built_at = time.monotonic()
+        return columns
+
+    def clear(self) -> None:
+        with self._lock:
+            self.columns = None
+            self.version = None
+            self.built_at = 0.0
+            self._building = None
+
+
+candidate_cache = CandidateCache()
+
+
+def recommend(
+    columns: LoadColumns,
+    k: int,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    capacity_kg: Optional[float] = None,
+    materials: Optional[set[str]] = None,
+) -> list[dict]:
+    """Returns the `k` best loads for a driver as rows with `score` and `distance_km` added."""
+    scores, distances = score_loads(columns, lat, lng, capacity_kg, materials, now=datetime.now(timezone.utc).timestamp())
+    return [
+        {
+            **columns.row(index),
+            "score": round(float(scores[index]), 4),
+            "distance_km": None if np.isnan(distances[index]) else round(float(distances[index]), 2),
+        }
+        for index in top_k(scores, k)
+    ]
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from backend.models import User, UserCreate
 from typing import Optional
-from backend.database import db
-from backend.security import verify_password, get_password_hash, create_access_token
+from backend.database import call_firestore, store
+from backend.security import create_access_token, user_cache
+from backend.hashing import HashingPoolBusy, hash_password_async, verify_and_rehash_async
+from backend.rate_limit import login_limiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _hashing_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post('/register', status_code=status.HTTP_201_CREATED)
-def register(user_in: UserCreate):
+async def register(user_in: UserCreate):
     """
     Register a new user.
     
@@ -17,15 +26,15 @@ def register(user_in: UserCreate):
     """
     try:
         # Check if database is available
-        if db is None:
+        if store is None:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Database connection not available. Please check your Firebase configuration."
             )
         
         # Check if user already exists
-        user_ref = db.collection('users').document(user_in.email)
-        existing_user = user_ref.get()
+        user_ref = store.collection('users').document(user_in.email)
+        existing_user = await call_firestore(user_ref.get)
         
         if existing_user.exists:
             raise HTTPException(
@@ -33,8 +42,8 @@ def register(user_in: UserCreate):
                 detail="Email already registered"
             )
         
-        # Hash the password
-        hashed_password = get_password_hash(user_in.password)
+        # Hash the password in the dedicated hashing pool, off the request threadpool.
+        hashed_password = await hash_password_async(user_in.password)
         
         # Create user object
         user_db = User(
@@ -45,13 +54,16 @@ def register(user_in: UserCreate):
         )
         
         # Save user to database
-        user_ref.set(user_db.model_dump())
+        await call_firestore(user_ref.set, user_db.model_dump())
+        user_cache.invalidate(user_in.email)
         
         return {"message": "User registered successfully"}
         
     except HTTPException:
         # Re-raise HTTP exceptions as they are already properly formatted
         raise
+    except HashingPoolBusy:
+        raise _hashing_busy_exception()
     except Exception as e:
         # Handle any other unexpected errors
         raise HTTPException(
@@ -59,20 +71,22 @@ def register(user_in: UserCreate):
             detail=f"Registration failed: {str(e)}"
         )
 
-def authenticate_user(email: str, password: str) -> Optional[User]:
+async def authenticate_user(email: str, password: str) -> Optional[User]:
     """
     Authenticate a user by email and password.
     
     Returns the user object if authentication is successful, None otherwise.
+    If the stored hash was made with outdated bcrypt settings, it is transparently
+    replaced with a fresh one.
     """
     try:
         # Check if database is available
-        if db is None:
+        if store is None:
             return None
         
         # Get user from database
-        user_ref = db.collection('users').document(email)
-        user_doc = user_ref.get()
+        user_ref = store.collection('users').document(email)
+        user_doc = await call_firestore(user_ref.get)
         
         if not user_doc.exists:
             return None
@@ -81,27 +95,49 @@ def authenticate_user(email: str, password: str) -> Optional[User]:
         user_data = user_doc.to_dict()
         user = User(**user_data)
         
-        # Verify password
-        if not verify_password(password, user.hashed_password):
+        # Verify password in the dedicated hashing pool
+        is_valid, new_hash = await verify_and_rehash_async(password, user.hashed_password)
+        if not is_valid:
             return None
+
+        if new_hash:
+            try:
+                await call_firestore(user_ref.update, {"hashed_password": new_hash})
+                user_cache.invalidate(email)
+                user.hashed_password = new_hash
+            except Exception as e:
+                # The old hash still works, so a failed upgrade must not fail the login.
+                print(f"Password rehash failed for {email}: {e}")
         
         return user
         
+    except HashingPoolBusy:
+        raise
     except Exception as e:
         # Log error and return None for any authentication errors
         print(f"Authentication error: {e}")
         return None
 
 @router.post('/token', status_code=status.HTTP_200_OK)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Login endpoint for user authentication.
     
-    Returns an access token if credentials are valid.
+    Returns an access token if credentials are valid. Attempts are rate limited per
+    client IP and per username; throttled attempts get a 429 with `Retry-After`
+    before any database read or password hashing.
     """
+    retry_after = await login_limiter.check(request.client.host if request.client else None, form_data.username)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     try:
         # Authenticate user
-        user = authenticate_user(form_data.username, form_data.password)
+        user = await authenticate_user(form_data.username, form_data.password)
         
         if not user:
             raise HTTPException(
@@ -111,7 +147,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
             )
         
         # Create access token
-        access_token = create_access_token(data={"sub": user.email, "role": user.role})
+        access_token = create_access_token(data={"sub": user.email, "role": user.role, "name": user.user_name})
         
         return {
             "access_token": access_token, 
@@ -122,6 +158,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
     except HTTPException:
         # Re-raise HTTP exceptions as they are already properly formatted
         raise
+    except HashingPoolBusy:
+        raise _hashing_busy_exception()
     except Exception as e:
         # Handle any other unexpected errors
         raise HTTPException(
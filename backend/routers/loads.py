@@ -1,12 +1,221 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+import hashlib
+import itertools
+import os
+import random
+from collections import Counter
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timezone
+from typing import Literal, NamedTuple, Optional
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+from google.api_core.exceptions import Aborted, FailedPrecondition
 from google.cloud.firestore_v1.base_query import FieldFilter, Or
-from backend.database import db
-from backend.models import LoadCreate, LoadCreateResponse, User, LoadRead
-from backend.security import get_current_user
+from backend.database import call_firestore, get_documents, store, stream_documents
+from backend.models import (
+    BulkLoadResponse, BulkLoadResult, LoadCreate, LoadCreateResponse, User, LoadNearby, LoadRead, LoadRecommendation,
+    LoadSummary,
+    LoadTransitionBatch, LoadTransitionBatchResponse, LoadTransitionResult, TokenPrincipal
+)
+from backend.security import get_current_user, get_token_principal
+from backend.cache import TTLCache
+from backend.load_stats import DAILY_COUNTS_COLLECTION, MAX_BATCH_SIZE, counter_increment
+from backend.bulk_ingest import BulkParseError, iter_csv_records, iter_json_array
+from backend.geo import geohash_ranges, haversine_km, load_coordinates
+from backend.load_board import encode_entry, load_board, sse_frame
 
 # Create a new router for loads
-router = APIRouter()
+router = APIRouter(prefix="/loads", tags=["Loads"])
+
+# Upper bound for the `limit` query parameter of paginated list endpoints.
+MAX_PAGE_SIZE = 1000
+
+# Conditional writes that lose a race on a hot load are retried with jittered
+# exponential backoff, up to ACCEPT_MAX_ATTEMPTS in total.
+ACCEPT_MAX_ATTEMPTS = int(os.getenv("ACCEPT_MAX_ATTEMPTS", "5"))
+ACCEPT_BACKOFF_BASE_SECONDS = float(os.getenv("ACCEPT_BACKOFF_BASE_SECONDS", "0.02"))
+
+# Contention counters for load acceptance: attempts, conflicts, retries and exhausted.
+accept_stats = Counter()
+
+# Largest search radius of /loads/nearby, in kilometres.
+MAX_NEARBY_RADIUS_KM = 500
+
+# Largest number of loads accepted by one bulk upload, and the upload read size.
+BULK_MAX_LOADS = int(os.getenv("BULK_MAX_LOADS", "10000"))
+BULK_READ_CHUNK_BYTES = 64 * 1024
+
+# Idle live-board streams get a comment line this often, so proxies keep them open.
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Short-lived cache of the per-user lists apps poll (/shipper/me, /my-active), keyed by
+# user, list generation, path and query string. A user's generation is replaced whenever
+# this API changes one of their loads, so their own writes show up immediately.
+LOAD_LIST_CACHE_MAXSIZE = int(os.getenv("LOAD_LIST_CACHE_MAXSIZE", "10000"))
+LOAD_LIST_CACHE_TTL_SECONDS = float(os.getenv("LOAD_LIST_CACHE_TTL_SECONDS", "5"))
+load_list_cache = TTLCache(maxsize=LOAD_LIST_CACHE_MAXSIZE, ttl=LOAD_LIST_CACHE_TTL_SECONDS)
+# Generations are bounded like the lists. An expired or evicted one is replaced by a
+# never-used value rather than restarting from zero, so it can only cause a cache miss.
+_load_list_generations = TTLCache(maxsize=LOAD_LIST_CACHE_MAXSIZE, ttl=10 * LOAD_LIST_CACHE_TTL_SECONDS)
+_next_load_list_generation = itertools.count()
+
+class Projection(NamedTuple):
+    """A slimmer view of loads: the document fields to select and the model to return them as."""
+    fields: list[str]
+    model: type[BaseModel]
+    adapter: TypeAdapter
+
+def _make_projection(model: type[BaseModel]) -> Projection:
+    return Projection(
+        fields=[field for field in model.model_fields if field != "id"],
+        model=model,
+        adapter=TypeAdapter(list[model]),
+    )
+
+SUMMARY_PROJECTION = _make_projection(LoadSummary)
+
+@lru_cache(maxsize=64)
+def _fields_projection(fields: tuple[str, ...]) -> Projection:
+    """Builds (once per field set) a model with the ID plus the requested, optional, load fields."""
+    model = create_model(
+        "LoadFields",
+        id=(str, ...),
+        **{field: (Optional[LoadRead.model_fields[field].annotation], None) for field in fields},
+    )
+    return _make_projection(model)
+
+def load_projection(
+    view: Literal["full", "summary"] = Query("full", description="`summary` returns only id, origin, destination, weight and status"),
+    fields: Optional[str] = Query(None, description="Comma-separated load fields to return; the ID is always included"),
+) -> Optional[Projection]:
+    """
+    Dependency for the `view`/`fields` options of the load list endpoints. Returns None
+    for full loads, otherwise the projection to select from Firestore and respond with.
+    """
+    if fields is None:
+        return SUMMARY_PROJECTION if view == "summary" else None
+    if view != "full":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either `view` or `fields`, not both")
+
+    requested = tuple(sorted({field.strip() for field in fields.split(",") if field.strip()} - {"id"}))
+    unknown = [field for field in requested if field not in LoadRead.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown load fields: {', '.join(unknown)}"
+        )
+    return _fields_projection(requested)
+
+def _projected_response(loads: list[dict], projection: Projection, limit: Optional[int]) -> Response:
+    """
+    Serializes projected loads straight to JSON. Returning a Response skips the endpoint's
+    full `LoadRead` response model, which the slim rows would not satisfy.
+    """
+    body = projection.adapter.dump_json(projection.adapter.validate_python(loads))
+    response = Response(content=body, media_type="application/json")
+    _set_next_cursor(response, loads, limit)
+    return response
+
+def _set_next_cursor(response: Response, loads: list[dict], limit: Optional[int]) -> None:
+    """Advertises the cursor of the next page when the current page is full."""
+    if limit is not None and len(loads) == limit:
+        response.headers["X-Next-Cursor"] = loads[-1]["id"]
+
+class CachedLoadList:
+    """A load list response and its ETag. The body is serialized the first time it is sent."""
+
+    def __init__(self, etag: str, loads: list[dict], adapter: TypeAdapter, headers: dict):
+        self.etag = etag
+        self.headers = headers
+        self._loads = loads
+        self._adapter = adapter
+        self._body: Optional[bytes] = None
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = self._adapter.dump_json(self._adapter.validate_python(self._loads))
+            self._loads = None
+        return self._body
+
+LOAD_LIST_ADAPTER = TypeAdapter(list[LoadRead])
+
+def _load_list_key(request: Request, email: str) -> tuple:
+    generation = _load_list_generations.get(email)
+    if generation is None:
+        generation = next(_next_load_list_generation)
+        _load_list_generations.set(email, generation)
+    return (email, generation, request.url.path, str(request.query_params))
+
+def _invalidate_load_lists(*emails: Optional[str]) -> None:
+    """Makes the cached lists of these users unreachable (they expire on their own)."""
+    for email in emails:
+        if email:
+            _load_list_generations.set(email, next(_next_load_list_generation))
+
+async def _versioned_rows(query) -> tuple[list[dict], str]:
+    """
+    Reads a query as load dicts, along with an ETag derived from the result count and
+    each document's ID and `update_time`: it changes whenever a load is added to,
+    removed from or updated in the result.
+    """
+    loads = []
+    digest = hashlib.blake2b(digest_size=16)
+    async for doc in stream_documents(query):
+        loads.append({**doc.to_dict(), "id": doc.id})
+        digest.update(f"{doc.id}@{doc.update_time};".encode())
+    digest.update(str(len(loads)).encode())
+    return loads, f'"{digest.hexdigest()}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header (a list of strong or weak ETags, or `*`) matches `etag`."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+def _load_list_response(request: Request, cached: CachedLoadList) -> Response:
+    """Returns 304 without a body when the client already has this version, the list otherwise."""
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers={**headers, **cached.headers})
+
+async def _read_load_list(request: Request, key: tuple, query, projection: Optional[Projection],
+                          limit: Optional[int] = None) -> Response:
+    """Reads a per-user load list after a load_list_cache miss on `key`, caches and serves it."""
+    loads, etag = await _versioned_rows(query)
+    headers = {}
+    if limit is not None and len(loads) == limit:
+        headers["X-Next-Cursor"] = loads[-1]["id"]
+    cached = CachedLoadList(etag, loads, LOAD_LIST_ADAPTER if projection is None else projection.adapter, headers)
+    load_list_cache.set(key, cached)
+    return _load_list_response(request, cached)
+
+async def _document_rows(query):
+    """Yields the documents of a query as load dicts, including their ID."""
+    async for doc in stream_documents(query):
+        yield {**doc.to_dict(), "id": doc.id}
+
+async def _board_rows(entries):
+    """Yields in-memory load board entries as load dicts."""
+    for entry in entries:
+        yield entry._asdict()
+
+def _ndjson_response(rows, projection: Optional[Projection] = None) -> StreamingResponse:
+    """
+    Streams load dicts as newline-delimited JSON, one `LoadRead` (or projected load) per
+    line, as they arrive (e.g. from a Firestore stream), so server memory stays flat for any result size.
+    """
+    model = LoadRead if projection is None else projection.model
+
+    async def lines():
+        async for row in rows:
+            yield model.model_validate(row).model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.post(
     "/",
@@ -14,7 +223,7 @@ router = APIRouter()
     status_code=status.HTTP_201_CREATED,
     summary="Create a new load"
 )
-def create_load(
+async def create_load(
     load_in: LoadCreate,
     current_user: User = Depends(get_current_user)
 ):
@@ -24,8 +233,8 @@ def create_load(
     - **Requires authentication.**
     - Checks if the user is a 'shipper'.
     - Receives load data (origin, destination, etc.).
-    - Adds shipper ID, posted date, and a default 'posted' status.
-    - Saves to the 'loads' collection in Firestore.
+    - Adds shipper ID, posted date, a default 'posted' status and the geocoded origin/destination.
+    - Saves to the 'loads' collection in Firestore and increments the day's load counter.
     - Returns the complete load object, including its new ID.
     """
     if current_user.role != 'shipper':
@@ -36,34 +245,179 @@ def create_load(
 
     try:
         # Prepare the data to be stored in Firestore
+        posted_date = datetime.now(timezone.utc)
         load_dict = load_in.model_dump()
         load_dict.update({
             "shipper_id": current_user.email,
             "loader_id": None,
-            "posted_date": datetime.now(timezone.utc),
-            "status": "stand by"  # Initial status for a newly created load
+            "posted_date": posted_date,
+            "status": "stand by",  # Initial status for a newly created load
+            **load_coordinates(load_in.origin, load_in.destination),
         })
 
-        # Add a new document to the 'loads' collection with an auto-generated ID
-        _update_time, doc_ref = db.collection("loads").add(load_dict)
+        # Write the load under an auto-generated ID together with the day's load counter
+        # (which the forecast reads instead of scanning loads) in one atomic batch.
+        doc_ref = store.collection("loads").document()
+        counter_id, counter_update = counter_increment(posted_date)
+        batch = store.batch()
+        batch.set(doc_ref, load_dict)
+        batch.set(store.collection(DAILY_COUNTS_COLLECTION).document(counter_id), counter_update, merge=True)
+        await call_firestore(batch.commit)
+        _invalidate_load_lists(current_user.email)
 
         return {"load_id": doc_ref.id, "message": "Load posted successfully"}
 
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'load'}: {detail['msg']}" for detail in error.errors()
+    )
+
+async def _upload_chunks(upload):
+    """Reads an uploaded (spooled) file in fixed-size chunks."""
+    while chunk := await upload.read(BULK_READ_CHUNK_BYTES):
+        yield chunk
+
+async def _bulk_records(request: Request):
+    """
+    Returns an async iterator over the loads of a bulk upload, picked by content type:
+    a JSON array or CSV request body, or a `file` in a multipart form (CSV if the file
+    is named *.csv or sent as text/csv, JSON otherwise).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        return iter_json_array(request.stream())
+    if content_type == "text/csv":
+        return iter_csv_records(request.stream())
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing the `file` upload")
+        if (upload.filename or "").lower().endswith(".csv") or upload.content_type == "text/csv":
+            return iter_csv_records(_upload_chunks(upload))
+        return iter_json_array(_upload_chunks(upload))
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send a JSON array (application/json), CSV (text/csv) or a multipart `file` upload"
+    )
+
+async def _write_load_batch(pending: list[tuple[int, dict]]) -> list[BulkLoadResult]:
+    """
+    Writes up to MAX_BATCH_SIZE - 1 loads plus their daily counter increment in one
+    atomic batch. If the commit fails, every load of the batch is reported as failed.
+    """
+    posted_date = datetime.now(timezone.utc)
+    batch = store.batch()
+    loads = store.collection("loads")
+    refs = []
+    for _row, load_dict in pending:
+        load_dict["posted_date"] = posted_date
+        ref = loads.document()
+        batch.set(ref, load_dict)
+        refs.append(ref)
+    counter_id, counter_update = counter_increment(posted_date, len(pending))
+    batch.set(store.collection(DAILY_COUNTS_COLLECTION).document(counter_id), counter_update, merge=True)
+
+    try:
+        await call_firestore(batch.commit)
+    except Exception as e:
+        return [BulkLoadResult(row=row, error=f"Write failed: {e}") for row, _load in pending]
+    return [BulkLoadResult(row=row, load_id=ref.id) for (row, _load), ref in zip(pending, refs)]
+
+@router.post(
+    "/bulk",
+    response_model=BulkLoadResponse,
+    summary="Create many loads from a JSON array or CSV upload"
+)
+async def create_loads_bulk(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Creates up to BULK_MAX_LOADS loads in one request.
+
+    - **Requires authentication.**
+    - Checks if the user is a 'shipper'.
+    - Accepts a JSON array of loads, a CSV with a header row (origin, destination,
+      material_type, weight, order_description), or either one as a multipart `file` upload.
+    - The upload is parsed incrementally and each load is validated like `POST /loads/`;
+      invalid loads are reported and skipped, the others are written in batches of up to 500.
+    - Returns a result per load: its new `load_id`, or the `error` that stopped it.
+      A malformed upload stops at the first bad record; the loads before it are still created.
+    """
+    if current_user.role != 'shipper':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only shippers can create new loads."
+        )
+
+    records = await _bulk_records(request)
+    results: list[BulkLoadResult] = []
+    pending: list[tuple[int, dict]] = []
+    row = 0
+    try:
+        async for record in records:
+            row += 1
+            if row > BULK_MAX_LOADS:
+                results.append(BulkLoadResult(row=row, error=f"Too many loads; at most {BULK_MAX_LOADS} per upload"))
+                break
+            if not isinstance(record, dict):
+                results.append(BulkLoadResult(row=row, error="Each load must be an object"))
+                continue
+            try:
+                load_in = LoadCreate.model_validate(record)
+            except ValidationError as e:
+                results.append(BulkLoadResult(row=row, error=_format_validation_error(e)))
+                continue
+
+            load_dict = load_in.model_dump()
+            load_dict.update({
+                "shipper_id": current_user.email,
+                "loader_id": None,
+                "status": "stand by",
+                **load_coordinates(load_in.origin, load_in.destination),
+            })
+            pending.append((row, load_dict))
+            # One slot of each batch is kept for the daily counter increment.
+            if len(pending) == MAX_BATCH_SIZE - 1:
+                results.extend(await _write_load_batch(pending))
+                pending = []
+    except BulkParseError as e:
+        results.append(BulkLoadResult(row=row + 1, error=str(e)))
+
+    if pending:
+        results.extend(await _write_load_batch(pending))
+
+    results.sort(key=lambda result: result.row)
+    created = sum(1 for result in results if result.load_id is not None)
+    if created:
+        _invalidate_load_lists(current_user.email)
+    return BulkLoadResponse(created=created, failed=len(results) - created, results=results)
+
 @router.get(
     "/shipper/me",
     response_model=list[LoadRead],
     summary="Get all loads for the current shipper"
 )
-def get_my_shipper_loads(current_user: User = Depends(get_current_user)):
+async def get_my_shipper_loads(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of loads to return"),
+    cursor: Optional[str] = Query(None, description="ID of the last load of the previous page (from `X-Next-Cursor`)"),
+    format: Literal["json", "ndjson"] = Query("json", description="`ndjson` streams one load per line"),
+    projection: Optional[Projection] = Depends(load_projection),
+    current_user: User = Depends(get_current_user)
+):
     """
     Retrieves all loads posted by the currently authenticated shipper.
 
     - **Requires authentication.**
     - Checks if the user is a 'shipper'.
     - Returns a list of loads, ordered by the most recently posted.
+    - Supports `limit`/`cursor` pagination; the next cursor is returned in the `X-Next-Cursor` header.
+    - `format=ndjson` streams the loads as newline-delimited JSON.
+    - `view=summary` or `fields=...` only reads and returns those fields of each load.
+    - JSON responses carry an `ETag`; send it back in `If-None-Match` to get an empty 304
+      while the list is unchanged. Lists are cached per user for LOAD_LIST_CACHE_TTL_SECONDS.
     """
     if current_user.role != 'shipper':
         raise HTTPException(
@@ -71,18 +425,39 @@ def get_my_shipper_loads(current_user: User = Depends(get_current_user)):
             detail="Only shippers can view their posted loads"
         )
 
+    key = _load_list_key(request, current_user.email)
+    if format == "json":
+        cached = load_list_cache.get(key)
+        if cached is not None:
+            return _load_list_response(request, cached)
+
     try:
         # Query the 'loads' collection for documents where 'shipper_id' matches the current user's email.
         # Order the results by 'posted_date' in descending order to get the newest loads first.
-        docs = db.collection('loads') \
+        query = store.collection('loads') \
             .where(filter=FieldFilter('shipper_id', '==', current_user.email)) \
-            .order_by('posted_date', direction='DESCENDING') \
-            .stream()
-
-        # The response model `LoadRead` expects an `id` field, which is not part of the document data.
-        # We construct a list of dictionaries, adding the document ID to each one.
-        loads = [{**doc.to_dict(), "id": doc.id} for doc in docs]
-        return loads
+            .order_by('posted_date', direction='DESCENDING')
+
+        if limit is not None or cursor is not None:
+            # Break ties on the document ID so that pages never overlap or skip loads.
+            query = query.order_by('__name__', direction='DESCENDING')
+            if cursor:
+                cursor_doc = await call_firestore(store.collection('loads').document(cursor).get)
+                if not cursor_doc.exists or cursor_doc.to_dict().get('shipper_id') != current_user.email:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+                query = query.start_after(cursor_doc)
+            if limit is not None:
+                query = query.limit(limit)
+
+        if projection is not None:
+            query = query.select(projection.fields)
+
+        if format == "ndjson":
+            return _ndjson_response(_document_rows(query), projection)
+
+        return await _read_load_list(request, key, query, projection, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -91,14 +466,28 @@ def get_my_shipper_loads(current_user: User = Depends(get_current_user)):
     response_model=list[LoadRead],
     summary="Get all available loads for drivers"
 )
-def get_available_loads(current_user: User = Depends(get_current_user)):
+async def get_available_loads(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of loads to return"),
+    cursor: Optional[str] = Query(None, description="ID of the last load of the previous page (from `X-Next-Cursor`)"),
+    format: Literal["json", "ndjson"] = Query("json", description="`ndjson` streams one load per line"),
+    origin: Optional[str] = Query(None, description="Only loads from this origin (exact match)"),
+    destination: Optional[str] = Query(None, description="Only loads to this destination (exact match)"),
+    material_type: Optional[str] = Query(None, description="Only loads of this material type (exact match)"),
+    projection: Optional[Projection] = Depends(load_projection),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
     """
     Retrieves all loads that are available to be accepted by a driver.
     An available load is one with the status 'stand by'.
 
-    - **Requires authentication.**
+    - **Requires authentication** (token claims only, no user lookup).
     - Checks if the user is a 'loader' (driver).
-    - Returns a list of available loads.
+    - Returns a list of available loads, optionally filtered by origin, destination and material type.
+    - Supports `limit`/`cursor` pagination; the next cursor is returned in the `X-Next-Cursor` header.
+    - `format=ndjson` streams the loads as newline-delimited JSON.
+    - `view=summary` or `fields=...` only reads and returns those fields of each load.
+    - When the in-memory load board is enabled, it is served without any Firestore reads.
     """
     if current_user.role != 'loader':
         raise HTTPException(
@@ -106,83 +495,331 @@ def get_available_loads(current_user: User = Depends(get_current_user)):
             detail="Only loaders can view available loads."
         )
     try:
+        if load_board.ready.is_set():
+            entries = load_board.query(
+                origin=origin, destination=destination, material_type=material_type,
+                limit=limit, cursor=cursor,
+            )
+            if format == "ndjson":
+                return _ndjson_response(_board_rows(entries), projection)
+            loads = [entry._asdict() for entry in entries]
+            if projection is not None:
+                return _projected_response(loads, projection, limit)
+            _set_next_cursor(response, loads, limit)
+            return loads
+
         # Query for loads where the status is 'stand by'.
-        docs = db.collection('loads').where(filter=FieldFilter('status', '==', 'stand by')).stream()
-        loads = [{**doc.to_dict(), "id": doc.id} for doc in docs]
+        query = store.collection('loads').where(filter=FieldFilter('status', '==', 'stand by'))
+        for field, value in (("origin", origin), ("destination", destination), ("material_type", material_type)):
+            if value is not None:
+                query = query.where(filter=FieldFilter(field, '==', value))
+
+        if limit is not None or cursor is not None:
+            # Pages are ordered by document ID, so the cursor needs no extra read.
+            query = query.order_by('__name__')
+            if cursor:
+                query = query.start_after({'__name__': cursor})
+            if limit is not None:
+                query = query.limit(limit)
+
+        if projection is not None:
+            query = query.select(projection.fields)
+
+        if format == "ndjson":
+            return _ndjson_response(_document_rows(query), projection)
+
+        loads = [{**doc.to_dict(), "id": doc.id} async for doc in stream_documents(query)]
+        if projection is not None:
+            return _projected_response(loads, projection, limit)
+        _set_next_cursor(response, loads, limit)
         return loads
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.put(
-    "/{load_id}/accept",
-    summary="Accept an available load"
+@router.get(
+    "/available/stream",
+    summary="Stream live load board updates (Server-Sent Events)"
 )
-def accept_load(load_id: str, current_user: User = Depends(get_current_user)):
+async def stream_available_loads(current_user: TokenPrincipal = Depends(get_token_principal)):
     """
-    Allows a driver to accept a load.
+    Streams the load board as Server-Sent Events instead of polling `/loads/available`.
 
-    - **Requires authentication.**
+    - **Requires authentication** (bearer token, token claims only).
     - Checks if the user is a 'loader' (driver).
-    - Verifies the load exists and its status is 'stand by'.
-    - Updates the load's status to 'transit' and assigns the current driver's email as the 'loader_id'.
+    - Sends a `snapshot` event with all available loads, then only deltas:
+      `added` (a new stand-by load), `updated` (a stand-by load changed) and
+      `removed` (`{"id": ...}`; the load was accepted or left 'stand by').
+    - Requires the in-memory load board (`LOAD_BOARD_ENABLED`); each update is encoded
+      once and shared by every connected client.
     """
     if current_user.role != 'loader':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only loaders can accept loads."
+            detail="Only loaders can view available loads."
+        )
+    if not load_board.ready.is_set():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live load board is not available. Poll /loads/available instead."
         )
 
-    doc_ref = db.collection('loads').document(load_id)
-    doc = doc_ref.get()
+    subscription, entries, snapshot_version = load_board.subscribe()
+
+    async def events():
+        try:
+            snapshot = ",".join(encode_entry(entry) for entry in entries)
+            yield sse_frame("snapshot", f"[{snapshot}]", snapshot_version)
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if item is None:
+                    return
+                version, frames = item
+                # Changes up to the snapshot version are already part of the snapshot.
+                if version > snapshot_version:
+                    for frame in frames:
+                        yield frame
+        finally:
+            load_board.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _geohash_range_rows(start: str, end: str) -> list[dict]:
+    """Reads the stand-by loads whose origin geohash is in [start, end)."""
+    query = store.collection('loads') \
+        .where(filter=FieldFilter('status', '==', 'stand by')) \
+        .where(filter=FieldFilter('origin_geohash', '>=', start)) \
+        .where(filter=FieldFilter('origin_geohash', '<', end))
+    return [{**doc.to_dict(), "id": doc.id} async for doc in stream_documents(query)]
 
-    if not doc.exists:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Load not found")
+@router.get(
+    "/nearby",
+    response_model=list[LoadNearby],
+    summary="Get available loads near a location"
+)
+async def get_nearby_loads(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the search centre"),
+    lng: float = Query(..., ge=-180, le=180, description="Longitude of the search centre"),
+    radius_km: float = Query(50, gt=0, le=MAX_NEARBY_RADIUS_KM, description="Search radius around the centre, in km"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of loads to return"),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
+    """
+    Retrieves the available loads whose origin lies within `radius_km` of a point, nearest first.
 
-    load = doc.to_dict()
-    if load.get('status') != 'stand by':
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Load not available")
+    - **Requires authentication** (token claims only, no user lookup).
+    - Checks if the user is a 'loader' (driver).
+    - Only the geohash cells around the point are scanned (at most 9 range queries, or the
+      in-memory load board), then candidates are filtered by exact great-circle distance.
+    - Loads whose origin could not be geocoded are never returned.
+    """
+    if current_user.role != 'loader':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only loaders can view available loads."
+        )
 
-    # Update the document with the new status and the driver's ID.
-    doc_ref.update({
-        "status": "transit",
-        "loader_id": current_user.email
-    })
+    ranges = geohash_ranges(lat, lng, radius_km)
+    try:
+        if load_board.ready.is_set():
+            rows = [entry._asdict() for entry in load_board.in_geohash_ranges(ranges)]
+        else:
+            # The range queries need a composite index on (status, origin_geohash).
+            pages = await asyncio.gather(*(_geohash_range_rows(start, end) for start, end in ranges))
+            rows = [row for page in pages for row in page]
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    return {"message": "Load accepted", "load_id": load_id}
+    nearby = []
+    for row in rows:
+        if row.get("origin_lat") is None or row.get("origin_lng") is None:
+            continue
+        distance = haversine_km(lat, lng, row["origin_lat"], row["origin_lng"])
+        if distance <= radius_km:
+            nearby.append({**row, "distance_km": round(distance, 2)})
+    nearby.sort(key=lambda row: row["distance_km"])
+    return nearby[:limit]
+
+async def _recommendation_columns():
+    """
+    Returns the columnar candidate cache for /loads/recommended, rebuilt from the load
+    board when its version changed. The caller checks that the board is ready.
+    """
+    from backend.recommendations import candidate_cache
 
-@router.put(
-    "/{load_id}/deliver",
-    summary="Mark a load as delivered"
+    version = load_board.version
+
+    async def build():
+        # Building the arrays is CPU-bound, so keep it off the event loop.
+        return await run_in_threadpool(candidate_cache.store, version, load_board.query())
+
+    return await candidate_cache.get(version, build)
+
+@router.get(
+    "/recommended",
+    response_model=list[LoadRecommendation],
+    summary="Get the available loads that best match a driver's truck"
 )
-def deliver_load(load_id: str, current_user: User = Depends(get_current_user)):
+async def get_recommended_loads(
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the driver's current location"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the driver's current location"),
+    capacity_kg: Optional[float] = Query(None, gt=0, description="Payload capacity of the truck, in kg"),
+    materials: Optional[str] = Query(None, description="Comma-separated material types the truck can carry"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="Number of loads to return"),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
     """
-    Allows a driver to mark a load as delivered.
+    Ranks every available load for the driver and returns the best `limit`, best first.
 
-    - **Requires authentication.**
+    - **Requires authentication** (token claims only, no user lookup).
     - Checks if the user is a 'loader' (driver).
-    - Verifies the load exists and is assigned to the current driver.
-    - Updates the load's status to 'delivered'.
+    - The score combines the distance from (`lat`, `lng`) to the load's origin, how much of
+      `capacity_kg` the load uses and how recently it was posted. Loads heavier than
+      `capacity_kg` or not one of `materials` are left out; omitted parameters don't count.
+    - All candidates are scored in one vectorized pass over a columnar copy of the in-memory
+      load board, so this endpoint requires LOAD_BOARD_ENABLED (503 until the board is ready).
     """
     if current_user.role != 'loader':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only loaders can view available loads."
+        )
+    if (lat is None) != (lng is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide both lat and lng, or neither."
+        )
+    if not load_board.ready.is_set():
+        # Rebuilding from Firestore would read every stand-by load on each refresh.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Recommendations need the live load board, which is not available."
+        )
+
+    from backend.recommendations import recommend
+
+    try:
+        columns = await _recommendation_columns()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    material_set = {m.strip() for m in materials.split(",") if m.strip()} if materials else None
+    return recommend(columns, limit, lat, lng, capacity_kg, material_set)
+
+VALID_STATUSES = ["transit", "stand by", "delivered"]
+
+# Status transition rules, shared by the single-load endpoints and the batch endpoint.
+
+def _check_transition_role(action: str, user: User) -> None:
+    """Raises 403 if the user's role may not perform `action` (accept, deliver or status)."""
+    if action == "accept" and user.role != 'loader':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only loaders can accept loads."
+        )
+    if action == "deliver" and user.role != 'loader':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only loaders can mark loads as delivered."
         )
 
-    doc_ref = db.collection('loads').document(load_id)
-    doc = doc_ref.get()
+def _check_new_status(new_status: Optional[str]) -> None:
+    """Raises 400 unless `new_status` is a valid load status."""
+    if new_status not in VALID_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
+        )
 
-    if not doc.exists:
+def _transition_update(action: str, load: Optional[dict], user: User, new_status: Optional[str] = None) -> dict:
+    """
+    Validates `action` against the current load document (None if it does not exist)
+    and returns the fields to update. Raises HTTPException if the transition is not allowed.
+    """
+    if load is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Load not found")
+    if action == "accept":
+        if load.get('status') != 'stand by':
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Load not available")
+        return {"status": "transit", "loader_id": user.email}
+    if action == "deliver":
+        if load.get('loader_id') != user.email:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only deliver loads assigned to you")
+        return {"status": "delivered"}
+    return {"status": new_status}
+
+@router.put(
+    "/{load_id}/accept",
+    summary="Accept an available load"
+)
+async def accept_load(load_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Allows a driver to accept a load.
+
+    - **Requires authentication.**
+    - Checks if the user is a 'loader' (driver).
+    - Verifies the load exists and its status is 'stand by'.
+    - Updates the load's status to 'transit' and assigns the current driver's email as the 'loader_id'.
+    - The update only applies if the load is unchanged since it was read, so two drivers
+      can never both win; the loser re-reads the load and gets 'Load not available'.
+    """
+    _check_transition_role("accept", current_user)
+
+    doc_ref = store.collection('loads').document(load_id)
+
+    for attempt in range(ACCEPT_MAX_ATTEMPTS):
+        accept_stats["attempts"] += 1
+        doc = await call_firestore(doc_ref.get)
+        load = doc.to_dict() if doc.exists else None
+        update = _transition_update("accept", load, current_user)
+
+        try:
+            # Update the document with the new status and the driver's ID, on the condition
+            # that nobody else has written to it since our read.
+            await call_firestore(doc_ref.update, update, option=store.write_option(last_update_time=doc.update_time))
+            _invalidate_load_lists(current_user.email, load.get('shipper_id'))
+            return {"message": "Load accepted", "load_id": load_id}
+        except (FailedPrecondition, Aborted):
+            accept_stats["conflicts"] += 1
+            if attempt + 1 < ACCEPT_MAX_ATTEMPTS:
+                accept_stats["retries"] += 1
+                await asyncio.sleep(random.uniform(0, ACCEPT_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    accept_stats["exhausted"] += 1
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Load is being updated by another request, please retry"
+    )
 
-    load = doc.to_dict()
-    if load.get('loader_id') != current_user.email:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only deliver loads assigned to you")
+@router.put(
+    "/{load_id}/deliver",
+    summary="Mark a load as delivered"
+)
+async def deliver_load(load_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Allows a driver to mark a load as delivered.
+
+    - **Requires authentication.**
+    - Checks if the user is a 'loader' (driver).
+    - Verifies the load exists and is assigned to the current driver.
+    - Updates the load's status to 'delivered'.
+    """
+    _check_transition_role("deliver", current_user)
+
+    doc_ref = store.collection('loads').document(load_id)
+    doc = await call_firestore(doc_ref.get)
+    load = doc.to_dict() if doc.exists else None
+    update = _transition_update("deliver", load, current_user)
 
     # Update the document with the delivered status
-    doc_ref.update({
-        "status": "delivered"
-    })
+    await call_firestore(doc_ref.update, update)
+    _invalidate_load_lists(current_user.email, load.get('shipper_id'))
 
     return {"message": "Load marked as delivered", "load_id": load_id}
 
@@ -190,7 +827,7 @@ def deliver_load(load_id: str, current_user: User = Depends(get_current_user)):
     "/{load_id}/status",
     summary="Update load status"
 )
-def update_load_status(
+async def update_load_status(
     load_id: str, 
     status_update: dict,
     current_user: User = Depends(get_current_user)
@@ -202,40 +839,124 @@ def update_load_status(
     - Validates the new status is one of: transit, stand by, delivered
     - Updates the load's status.
     """
-    valid_statuses = ["transit", "stand by", "delivered"]
     new_status = status_update.get("status")
-    
-    if new_status not in valid_statuses:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
-        )
+    _check_new_status(new_status)
 
-    doc_ref = db.collection('loads').document(load_id)
-    doc = doc_ref.get()
-
-    if not doc.exists:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Load not found")
+    doc_ref = store.collection('loads').document(load_id)
+    doc = await call_firestore(doc_ref.get)
+    load = doc.to_dict() if doc.exists else None
+    update = _transition_update("status", load, current_user, new_status)
 
     # Update the document with the new status
-    doc_ref.update({
-        "status": new_status
-    })
+    await call_firestore(doc_ref.update, update)
+    _invalidate_load_lists(load.get('shipper_id'), load.get('loader_id'))
 
     return {"message": f"Load status updated to {new_status}", "load_id": load_id}
 
+def _transition_failure(load_id: str, error: HTTPException) -> LoadTransitionResult:
+    return LoadTransitionResult(load_id=load_id, error=error.detail, status_code=error.status_code)
+
+@router.post(
+    "/transitions",
+    response_model=LoadTransitionBatchResponse,
+    summary="Accept, deliver or update the status of many loads at once"
+)
+async def transition_loads(batch_in: LoadTransitionBatch, current_user: User = Depends(get_current_user)):
+    """
+    Applies up to 500 status changes (`accept`, `deliver` or `status`) in one request.
+
+    - **Requires authentication.**
+    - Each change follows the same rules as `PUT /loads/{id}/accept`, `/deliver` and `/status`.
+    - All loads are read with one `get_all` and the allowed changes are committed in one
+      batched write, on the condition that none of the loads changed since they were read;
+      if one did, the batch is re-read and retried.
+    - Returns a result per change, in request order: the new status, or the error and the
+      HTTP status code the single-load endpoint would have returned.
+    """
+    items = batch_in.items
+    results: list[Optional[LoadTransitionResult]] = [None] * len(items)
+
+    # Checks that don't need the documents.
+    candidates = []
+    seen = set()
+    for index, item in enumerate(items):
+        try:
+            if item.load_id in seen:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate load_id in batch")
+            seen.add(item.load_id)
+            _check_transition_role(item.action, current_user)
+            if item.action == "status":
+                _check_new_status(item.status)
+        except HTTPException as e:
+            results[index] = _transition_failure(item.load_id, e)
+            continue
+        candidates.append(index)
+
+    loads = store.collection('loads')
+    for attempt in range(ACCEPT_MAX_ATTEMPTS):
+        if not candidates:
+            break
+        docs = {doc.id: doc for doc in await get_documents(store, [loads.document(items[i].load_id) for i in candidates])}
+
+        batch = store.batch()
+        staged = []
+        affected_users = set()
+        for index in candidates:
+            item = items[index]
+            doc = docs.get(item.load_id)
+            load = doc.to_dict() if doc is not None and doc.exists else None
+            try:
+                update = _transition_update(item.action, load, current_user, item.status)
+            except HTTPException as e:
+                results[index] = _transition_failure(item.load_id, e)
+                continue
+            batch.update(loads.document(item.load_id), update, option=store.write_option(last_update_time=doc.update_time))
+            staged.append((index, update["status"]))
+            affected_users.update((load.get('shipper_id'), load.get('loader_id'), update.get('loader_id')))
+
+        if not staged:
+            break
+        try:
+            await call_firestore(batch.commit)
+        except (FailedPrecondition, Aborted):
+            # Another request changed one of the loads; re-read them all and re-validate.
+            candidates = [index for index, _new_status in staged]
+            if attempt + 1 < ACCEPT_MAX_ATTEMPTS:
+                await asyncio.sleep(random.uniform(0, ACCEPT_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            continue
+        for index, new_status in staged:
+            results[index] = LoadTransitionResult(load_id=items[index].load_id, status=new_status)
+        _invalidate_load_lists(*affected_users)
+        candidates = []
+
+    for index in candidates:
+        results[index] = _transition_failure(items[index].load_id, HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Load is being updated by another request, please retry"
+        ))
+
+    succeeded = sum(1 for result in results if result.error is None)
+    return LoadTransitionBatchResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
 @router.get(
     "/my-active",
     response_model=list[LoadRead],
     summary="Get all active loads for the current driver"
 )
-def get_my_active_loads(current_user: User = Depends(get_current_user)):
+async def get_my_active_loads(
+    request: Request,
+    projection: Optional[Projection] = Depends(load_projection),
+    current_user: TokenPrincipal = Depends(get_token_principal)
+):
     """
     Retrieves all loads currently assigned to the authenticated driver.
 
-    - **Requires authentication.**
+    - **Requires authentication** (token claims only, no user lookup).
     - Checks if the user is a 'loader' (driver).
     - Returns a list of loads assigned to the driver.
+    - `view=summary` or `fields=...` only reads and returns those fields of each load.
+    - Responses carry an `ETag`; send it back in `If-None-Match` to get an empty 304
+      while the list is unchanged. Lists are cached per user for LOAD_LIST_CACHE_TTL_SECONDS.
     """
     if current_user.role != 'loader':
         raise HTTPException(
@@ -243,10 +964,16 @@ def get_my_active_loads(current_user: User = Depends(get_current_user)):
             detail="Only loaders can view their active loads."
         )
 
+    key = _load_list_key(request, current_user.email)
+    cached = load_list_cache.get(key)
+    if cached is not None:
+        return _load_list_response(request, cached)
+
     try:
         # Query for loads where the loader_id matches the current user's email.
-        docs = db.collection('loads').where(filter=FieldFilter('loader_id', '==', current_user.email)).stream()
-        loads = [{**doc.to_dict(), "id": doc.id} for doc in docs]
-        return loads
+        query = store.collection('loads').where(filter=FieldFilter('loader_id', '==', current_user.email))
+        if projection is not None:
+            query = query.select(projection.fields)
+        return await _read_load_list(request, key, query, projection)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
\ No newline at end of file
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, status
 from backend.models import User, MyCollectionCreate, MyCollectionRead
 from backend.security import get_current_user
-from backend.database import db
+from backend.database import call_firestore, store
 from datetime import datetime, timezone
 
 router = APIRouter(
@@ -22,10 +22,10 @@ async def create_my_collection_item(
     item_dict["created_at"] = datetime.now(timezone.utc)
 
     # Add the new document to the 'my_collection' collection
-    _update_time, item_ref = db.collection('my_collection').add(item_dict)
+    _update_time, item_ref = await call_firestore(store.collection('my_collection').add, item_dict)
 
     # Fetch the newly created document to return it with its ID
-    new_item_doc = item_ref.get()
+    new_item_doc = await call_firestore(item_ref.get)
     new_item = new_item_doc.to_dict()
     new_item['id'] = new_item_doc.id
     
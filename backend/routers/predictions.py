@@ -1,65 +1,269 @@
-import pandas as pd
-import statsmodels.api as sm
-from fastapi import APIRouter, HTTPException
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 from backend.database import db
-from datetime import timedelta
+from backend.forecasting import (
+    FORECAST_BUDGET_MS, FORECAST_DAYS, FORECAST_SEGMENT_BUDGET_MS, MAX_FORECAST_HORIZON, MIN_HISTORY_DAYS,
+    SEGMENT_FIELDS, ForecastModel, InsufficientDataError, daily_series_from_counts, forecast_segments,
+    forecast_with_budget, segment_daily_counts
+)
+from backend.forecast_jobs import GLOBAL_FORECAST_ID, is_fresh, read_stored_forecast
+from backend.load_stats import latest_daily_count, read_daily_counts, read_posted_loads
 
 router = APIRouter(prefix="/predictions", tags=["predictions"])
 
-@router.get("/loads-forecast")
-def get_load_forecast():
+# How often (at most) the daily counters are checked for new data before a refit.
+FORECAST_CHECK_INTERVAL_SECONDS = float(os.getenv("FORECAST_CHECK_INTERVAL_SECONDS", "60"))
+
+# Upper bounds for the segmented forecast parameters.
+MAX_SEGMENTS = 200
+MAX_SEGMENT_HISTORY_DAYS = 730
+
+
+class ForecastCache:
     """
-    Predicts the number of loads for the next 7 days using a SARIMA time-series model.
+    The daily load series and the data watermark it was read at, plus the forecasts
+    fitted on it, keyed by (horizon, model, budget_ms). Also holds the forecast document
+    precomputed by forecast_job.py (None if there is none) and the watermark it was read at.
     """
-    try:
-        # 1. Fetch data from Firestore
-        docs = db.collection('loads').stream()
-        posted_dates = [doc.to_dict().get('posted_date') for doc in docs if doc.to_dict().get('posted_date')]
 
-        if not posted_dates:
-            raise HTTPException(status_code=404, detail="No load data available to generate a forecast.")
+    def __init__(self):
+        self.watermark = None
+        self.series = None
+        self.forecasts = {}
+        self.checked_at = 0.0
+        self.fitted_at = None
+        self.stored = None
+        self.stored_watermark = None
+        self.stored_checked_at = 0.0
+        # Held while checking the watermark or fitting, so only one fit runs at a time.
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.watermark = None
+        self.series = None
+        self.forecasts = {}
+        self.checked_at = 0.0
+        self.fitted_at = None
+        self.stored = None
+        self.stored_watermark = None
+        self.stored_checked_at = 0.0
+
+
+forecast_cache = ForecastCache()
+
+# The forecast served without query parameters; it is refitted as soon as the data moves.
+DEFAULT_FORECAST_KEY = (FORECAST_DAYS, "auto", FORECAST_BUDGET_MS)
+
+# Forecasts with other parameters are cached too, up to this many at a time.
+MAX_CACHED_FORECASTS = 32
+
+
+def _data_watermark():
+    """
+    Returns a cheap fingerprint of the forecast input: the latest day's counter and
+    its count. It moves whenever a load is posted, at the cost of one document read.
+    """
+    return latest_daily_count(db)
+
 
-        # 2. Preprocess the data with pandas
-        df = pd.DataFrame(posted_dates, columns=['posted_date'])
-        df['posted_date'] = pd.to_datetime(df['posted_date'])
-        df.set_index('posted_date', inplace=True)
-        df['loads'] = 1
-        
-        # Resample to get daily counts, filling missing days with 0
-        daily_loads = df['loads'].resample('D').sum().asfreq('D', fill_value=0)
-
-        # We need at least 15 data points to train a simple model
-        if len(daily_loads) < 15:
-            raise HTTPException(status_code=400, detail=f"Not enough data to create a forecast. Need at least 15 days of data, but only have {len(daily_loads)}.")
-
-        # 3. Train a SARIMA time-series model
-        # The (p,d,q) and (P,D,Q,m) orders are hyperparameters. These are common starting points.
-        # m=7 indicates a weekly seasonal pattern.
-        model = sm.tsa.SARIMAX(
-            daily_loads,
-            order=(1, 1, 1),
-            seasonal_order=(1, 1, 1, 7),
-            enforce_stationarity=False,
-            enforce_invertibility=False
+def _read_series():
+    """Reads the daily load counters as a daily series."""
+    # Fetch the daily counter series from Firestore (one read per day, not per load)
+    daily_counts = read_daily_counts(db)
+
+    if not daily_counts:
+        raise HTTPException(
+            status_code=404,
+            detail="No load data available to generate a forecast. "
+                   "If loads exist, run backfill_load_stats.py to build the daily counters."
         )
-        
-        results = model.fit(disp=False)
 
-        # 4. Get the 7-day forecast
-        forecast = results.get_forecast(steps=7)
-        predicted_mean = forecast.predicted_mean
+    return daily_series_from_counts(daily_counts)
+
+
+def _fit_forecast(series, key: tuple) -> dict:
+    """Fits a forecast on `series` with the (horizon, model, budget_ms) of `key`."""
+    horizon, model, budget_ms = key
+    try:
+        return {**forecast_with_budget(series, horizon, model, budget_ms), "generated_at": datetime.now(timezone.utc)}
+    except InsufficientDataError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-        # Create the response
-        last_date = daily_loads.index[-1]
-        forecast_dates = pd.date_range(start=last_date + timedelta(days=1), periods=7)
-        
-        forecast_data = [
-            {"date": date.strftime('%Y-%m-%d'), "predicted_loads": max(0, round(value))}
-            for date, value in zip(forecast_dates, predicted_mean)
-        ]
+def _refresh_forecast(force: bool = False) -> None:
+    """
+    Re-reads the series and refits the default forecast if the data watermark has moved
+    since the last fit. Without `force`, returns immediately when another refresh is
+    already in progress.
+    """
+    if not forecast_cache.lock.acquire(blocking=force):
+        return
+    try:
+        if not force and forecast_cache.series is not None \
+                and time.monotonic() - forecast_cache.checked_at < FORECAST_CHECK_INTERVAL_SECONDS:
+            return
+        watermark = _data_watermark()
+        forecast_cache.checked_at = time.monotonic()
+        if forecast_cache.series is not None and watermark == forecast_cache.watermark:
+            return
+
+        series = _read_series()
+        # Fitted before anything is replaced, so a failed refit keeps the old forecasts.
+        default_forecast = _fit_forecast(series, DEFAULT_FORECAST_KEY)
+        forecast_cache.watermark = watermark
+        forecast_cache.series = series
+        forecast_cache.forecasts = {DEFAULT_FORECAST_KEY: default_forecast}
+        forecast_cache.fitted_at = time.time()
+    finally:
+        forecast_cache.lock.release()
 
-        return forecast_data
 
+def _refresh_forecast_in_background() -> None:
+    """Background refit; on failure the last good forecast keeps being served."""
+    try:
+        _refresh_forecast()
+    except Exception as e:
+        print(f"Forecast refit failed: {e}")
+
+
+def _stored_forecast():
+    """
+    Returns the fresh forecast precomputed by forecast_job.py, or None. The document is
+    kept in the forecast cache and looked up at most every FORECAST_CHECK_INTERVAL_SECONDS:
+    while there is none, with a single read; once cached, by checking the data watermark
+    and re-reading the document only if the watermark has moved since it was read.
+    """
+    stored = forecast_cache.stored
+    if stored is not None and not is_fresh(stored):
+        stored = None
+    now = time.monotonic()
+    if now - forecast_cache.stored_checked_at < FORECAST_CHECK_INTERVAL_SECONDS:
+        return stored
+    watermark = _data_watermark() if stored is not None else None
+    if stored is None or watermark != forecast_cache.stored_watermark:
+        stored = read_stored_forecast(db, GLOBAL_FORECAST_ID)
+    forecast_cache.stored = stored
+    forecast_cache.stored_watermark = watermark
+    forecast_cache.stored_checked_at = now
+    return stored
+
+
+def _cached_forecast(key: tuple) -> dict:
+    """Returns the forecast for `key`, fitting it on the cached series the first time."""
+    forecast = forecast_cache.forecasts.get(key)
+    if forecast is not None:
+        return forecast
+    with forecast_cache.lock:
+        forecast = forecast_cache.forecasts.get(key)
+        if forecast is None:
+            forecast = _fit_forecast(forecast_cache.series, key)
+            if len(forecast_cache.forecasts) >= MAX_CACHED_FORECASTS:
+                forecast_cache.forecasts = {}
+            forecast_cache.forecasts = {**forecast_cache.forecasts, key: forecast}
+        return forecast
+
+
+@router.get("/loads-forecast")
+def get_load_forecast(
+    background_tasks: BackgroundTasks,
+    horizon: int = Query(FORECAST_DAYS, ge=1, le=MAX_FORECAST_HORIZON, description="Number of days to forecast"),
+    model: ForecastModel = Query("auto", description="Forecast model; `auto` picks the best one within the budget"),
+    budget_ms: int = Query(FORECAST_BUDGET_MS, ge=10, le=60000, description="Time budget of the model fit"),
+):
+    """
+    Predicts the number of loads for the next `horizon` days.
+
+    The model is SARIMAX, Holt-Winters exponential smoothing or a seasonal-naive average
+    (`model`, most to least accurate). A model without enough history or one that would
+    not fit within `budget_ms` falls back to the next faster one; the response reports
+    the model that answered, its fit time and the reason for any fallback.
+
+    With `model=auto`, the forecast precomputed by forecast_job.py is served from the
+    forecast cache (re-read only after new loads were posted), unless it is older than
+    FORECAST_MAX_AGE_SECONDS or too short for `horizon`. Otherwise forecasts are computed on demand: fitted forecasts are cached
+    and served instantly, and when the cache is older than FORECAST_CHECK_INTERVAL_SECONDS,
+    a background task checks whether new loads have been posted and refits only if so.
+    The response's `source` tells which of the two answered.
+    """
+    try:
+        if model == "auto":
+            stored = _stored_forecast()
+            if stored is not None and horizon <= stored.get("horizon", 0):
+                return {**stored, "horizon": horizon, "forecast": stored["forecast"][:horizon], "source": "stored"}
+
+        if forecast_cache.series is None:
+            # Nothing to serve yet, so the first request has to wait for the fit.
+            _refresh_forecast(force=True)
+        elif time.monotonic() - forecast_cache.checked_at >= FORECAST_CHECK_INTERVAL_SECONDS:
+            background_tasks.add_task(_refresh_forecast_in_background)
+
+        return {**_cached_forecast((horizon, model, budget_ms)), "source": "computed"}
+
+    except HTTPException:
+        raise
     except Exception as e:
         # Catch-all for any other errors during processing
-        raise HTTPException(status_code=500, detail=f"An error occurred while generating the forecast: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred while generating the forecast: {str(e)}")
+
+
+@router.get("/loads-forecast/segments")
+def get_segment_forecasts(
+    by: Literal["lane", "material"] = Query("lane", description="Forecast per origin → destination lane or per material type"),
+    top: int = Query(20, ge=1, le=MAX_SEGMENTS, description="Only forecast this many of the busiest segments"),
+    history_days: int = Query(180, ge=MIN_HISTORY_DAYS, le=MAX_SEGMENT_HISTORY_DAYS, description="Days of history to fit on"),
+    horizon: int = Query(FORECAST_DAYS, ge=1, le=MAX_FORECAST_HORIZON, description="Number of days to forecast"),
+    model: ForecastModel = Query("auto", description="Forecast model; `auto` picks the best one within the budget"),
+    budget_ms: int = Query(FORECAST_SEGMENT_BUDGET_MS, ge=10, le=60000, description="Time budget of each segment's fit"),
+):
+    """
+    Predicts the number of loads for the next `horizon` days per lane or per material type.
+
+    Loads posted in the last `history_days` are grouped into daily series per segment, and
+    the `top` busiest segments are fitted in parallel across the forecast worker pool,
+    each falling back to a faster model like `/loads-forecast` does. A segment that
+    can't be forecast at all reports an `error` instead.
+
+    Segment forecasts precomputed by forecast_job.py with the same `history_days` and
+    at least `top` segments and `horizon` days are served from a single document read.
+    """
+    started = time.perf_counter()
+    try:
+        stored = read_stored_forecast(db, by) if model == "auto" else None
+        if stored is not None and stored.get("history_days") == history_days \
+                and horizon <= stored.get("horizon", 0) and top <= stored.get("top", 0):
+            segments = [
+                {**segment, "forecast": segment["forecast"] and segment["forecast"][:horizon]}
+                for segment in stored["segments"][:top]
+            ]
+            return {
+                "by": by,
+                "history_days": history_days,
+                "segments": segments,
+                "generated_at": stored["generated_at"],
+                "source": "stored",
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        since = datetime.now(timezone.utc) - timedelta(days=history_days)
+        rows = read_posted_loads(db, SEGMENT_FIELDS[by], since)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No load data available to generate a forecast.")
+        counts = segment_daily_counts(rows, by, top)
+        segments = forecast_segments(counts, horizon, model, budget_ms)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while generating the forecast: {str(e)}")
+
+    return {
+        "by": by,
+        "history_days": history_days,
+        "segments": segments,
+        "generated_at": datetime.now(timezone.utc),
+        "source": "computed",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
-from backend.models import User, UserRead
-from backend.security import get_current_user
+from backend.models import UserRead, TokenPrincipal
+from backend.security import get_token_principal
 
 router = APIRouter(
     prefix="/users",
@@ -8,10 +8,9 @@ router = APIRouter(
 )
 
 @router.get("/me", response_model=UserRead)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: TokenPrincipal = Depends(get_token_principal)):
     """
-    Get current user. This endpoint is `async` because its dependency,
-    `get_current_user`, is an `async` function that performs I/O operations
-    in a non-blocking way.
+    Get current user. The identity comes straight from the verified token
+    claims, so this endpoint performs no database reads.
     """
     return current_user
\ No newline at end of file
@@ -2,29 +2,32 @@ import os
 from datetime import datetime, timedelta, timezone
 import jwt
 from fastapi import Depends, HTTPException, status
-from passlib.context import CryptContext
 from pydantic import ValidationError
-from fastapi.concurrency import run_in_threadpool
 
-from backend.database import db
-from backend.models import User
+from backend.database import call_firestore, store
+from backend.models import User, TokenPrincipal
 from backend.dependencies import oauth2_scheme
+from backend.cache import TTLCache
 
 # --- JWT Configuration ---
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Initialize the password context, specifying bcrypt as the scheme
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# --- User Cache Configuration ---
+# Verified users are cached by email so that authenticated requests don't pay a
+# Firestore read each. Entries are dropped on registration and expire after the TTL.
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+user_cache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL_SECONDS)
 
-def get_password_hash(password: str) -> str:
-    """Hashes a plain password."""
-    return pwd_context.hash(password)
+# Recently decoded tokens, so clients polling with the same token don't pay for
+# signature verification on every request. Entries never outlive the token itself.
+TOKEN_MEMO_MAXSIZE = int(os.getenv("TOKEN_MEMO_MAXSIZE", "10000"))
+TOKEN_MEMO_TTL_SECONDS = float(os.getenv("TOKEN_MEMO_TTL_SECONDS", "60"))
+
+token_memo = TTLCache(maxsize=TOKEN_MEMO_MAXSIZE, ttl=TOKEN_MEMO_TTL_SECONDS)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Creates a new JWT access token."""
@@ -40,17 +43,23 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    """
-    Decodes the JWT token to get the current user.
-    Raises HTTPException if the token is invalid or the user doesn't exist.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def decode_access_token(token: str) -> TokenPrincipal:
+    """
+    Verifies the JWT signature and returns the principal it carries.
+    Decoded tokens are memoized until they (or the memo entry) expire.
+    Raises HTTPException if the token is invalid.
+    """
+    principal = token_memo.get(token)
+    if principal is not None:
+        return principal
+
     if not SECRET_KEY:
         raise ValueError("SECRET_KEY is not set for JWT validation")
 
@@ -58,22 +67,53 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str | None = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
+        principal = TokenPrincipal(
+            email=email,
+            role=payload.get("role", ""),
+            user_name=payload.get("name"),
+        )
     except (jwt.PyJWTError, ValidationError):
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
+    expires_in = payload.get("exp", 0) - datetime.now(timezone.utc).timestamp()
+    if expires_in > 0:
+        token_memo.set(token, principal, ttl=min(TOKEN_MEMO_TTL_SECONDS, expires_in))
+    return principal
+
+async def get_token_principal(token: str = Depends(oauth2_scheme)) -> TokenPrincipal:
+    """
+    Authenticates the request from the signed token claims alone.
+    Use this for read-only endpoints; it trusts the `role` claim and performs no database reads.
+    """
+    return decode_access_token(token)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Decodes the JWT token to get the current user.
+    Raises HTTPException if the token is invalid or the user doesn't exist.
+    """
+    credentials_exception = _credentials_exception()
+    email = decode_access_token(token).email
+
+    cached_user = user_cache.get(email)
+    if cached_user is not None:
+        return cached_user
+
     # Check if database is available
-    if db is None:
+    if store is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database connection not available"
         )
     
-    # Run the blocking I/O call in a separate thread to avoid blocking the event loop.
-    # This is crucial for performance and stability in an async application.
-    user_doc = await run_in_threadpool(db.collection('users').document(email).get)
+    # Await the read natively on the async client, or run it in a separate thread on
+    # the sync client, so that it never blocks the event loop.
+    user_doc = await call_firestore(store.collection('users').document(email).get)
 
     if not user_doc.exists:
         raise credentials_exception
     
-    return User(**user_doc.to_dict())
\ No newline at end of file
+    user = User(**user_doc.to_dict())
+    user_cache.set(email, user)
+    return user
@@ -0,0 +1,106 @@
+import itertools
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+from backend.geo import load_coordinates
+
+# Synthetic data for seeding local databases and for benchmarks. Everything here is
+# pure Python, so it can be used without a Firestore connection.
+
+CITIES = [
+    "Mumbai, India", "Delhi, India", "Bengaluru, India", "Chennai, India", "Kolkata, India",
+    "Hyderabad, India", "Pune, India", "Ahmedabad, India", "Jaipur, India", "Surat, India",
+    "Lucknow, India", "Kanpur, India", "Nagpur, India", "Indore, India", "Bhopal, India",
+    "Ludhiana, India", "Nashik, India", "Vadodara, India", "Coimbatore, India", "Visakhapatnam, India",
+    "Goa, India", "Kochi, India", "Guwahati, India", "Patna, India", "Raipur, India",
+]
+
+MATERIAL_TYPES = [
+    "General Goods", "Steel", "Cement", "FMCG", "Electronics", "Textiles",
+    "Automobile Parts", "Chemicals", "Food Grains", "Furniture", "Machinery", "Pharmaceuticals",
+]
+
+# Relative share of each status on a long-running board: most loads are already delivered.
+STATUS_WEIGHTS = {"delivered": 0.6, "transit": 0.15, "stand by": 0.25}
+
+# Relative posting volume per weekday (Monday first); weekends are quiet.
+WEEKDAY_WEIGHTS = [1.2, 1.15, 1.1, 1.1, 1.05, 0.7, 0.45]
+
+
+def _posting_days(days: int, end: datetime, rng: random.Random) -> tuple[list[datetime], list[float]]:
+    """Returns the candidate posting days and their weights: weekly seasonality plus a mild growth trend."""
+    start = end - timedelta(days=days - 1)
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    weights = [
+        WEEKDAY_WEIGHTS[date.weekday()] * (1.0 + 0.5 * offset / max(days - 1, 1)) * rng.uniform(0.85, 1.15)
+        for offset, date in enumerate(dates)
+    ]
+    return dates, weights
+
+
+def generate_loads(
+    count: int,
+    shipper_ids: list[str],
+    loader_ids: list[str],
+    days: int = 180,
+    seed: Optional[int] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[dict]:
+    """
+    Lazily yields `count` realistic load documents, shaped like the ones `POST /loads/` writes.
+
+    `posted_date`s are spread over the last `days` days with weekly seasonality and growth;
+    lanes favour the larger cities; statuses follow STATUS_WEIGHTS, and loads in transit or
+    delivered are assigned to one of `loader_ids`. Loads carry geocoded coordinates.
+    """
+    rng = random.Random(seed)
+    end = (end or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    dates, day_weights = _posting_days(days, end, rng)
+    # Zipf-like popularity, so a handful of lanes carry most of the traffic.
+    city_weights = [1.0 / math.sqrt(rank + 1) for rank in range(len(CITIES))]
+    statuses = list(STATUS_WEIGHTS)
+    # Cumulative weights are computed once instead of on every draw.
+    city_cum = list(itertools.accumulate(city_weights))
+    coordinates = {(origin, destination): load_coordinates(origin, destination) for origin in CITIES for destination in CITIES}
+    day_cum = list(itertools.accumulate(day_weights))
+    status_cum = list(itertools.accumulate(STATUS_WEIGHTS.values()))
+
+    for _ in range(count):
+        origin, destination = rng.choices(CITIES, cum_weights=city_cum, k=2)
+        while destination == origin:
+            destination = rng.choices(CITIES, cum_weights=city_cum)[0]
+        day = rng.choices(dates, cum_weights=day_cum)[0]
+        status = rng.choices(statuses, cum_weights=status_cum)[0]
+        yield {
+            "origin": origin,
+            "destination": destination,
+            "material_type": rng.choice(MATERIAL_TYPES),
+            "weight": rng.randrange(500, 40001, 250),
+            "order_description": None,
+            "shipper_id": rng.choice(shipper_ids),
+            "loader_id": None if status == "stand by" or not loader_ids else rng.choice(loader_ids),
+            "posted_date": day + timedelta(seconds=rng.randrange(6 * 3600, 22 * 3600)),
+            "status": status,
+            **coordinates[origin, destination],
+        }
+
+
+def generate_daily_counts(
+    days: int,
+    mean: float = 50.0,
+    seed: Optional[int] = None,
+    end: Optional[datetime] = None,
+) -> dict[str, int]:
+    """
+    Returns a {'YYYY-MM-DD': count} series shaped like the daily load counters,
+    averaging about `mean` loads per day with the same seasonality as `generate_loads`.
+    """
+    rng = random.Random(seed)
+    end = (end or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    dates, weights = _posting_days(days, end, rng)
+    scale = mean * days / sum(weights)
+    return {
+        date.strftime('%Y-%m-%d'): max(0, round(rng.gauss(weight * scale, math.sqrt(weight * scale))))
+        for date, weight in zip(dates, weights)
+    }
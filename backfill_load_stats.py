@@ -0,0 +1,52 @@
+import os
+import sys
+import pathlib
+from dotenv import load_dotenv
+
+# Explicitly find and load the .env file in the project root.
+project_root = pathlib.Path(__file__).parent
+dotenv_path = project_root / ".env"
+if dotenv_path.is_file():
+    load_dotenv(dotenv_path=dotenv_path)
+
+# Add project root to the Python path to allow imports from 'backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+try:
+    from backend.database import db
+    from backend.load_stats import DAILY_COUNTS_COLLECTION, backfill_daily_counts
+except ImportError as e:
+    print(f"Error importing backend modules: {e}")
+    print("Please ensure you are running this script from the project root directory.")
+    sys.exit(1)
+
+
+def backfill_load_stats():
+    """
+    Builds the daily load counters used by the forecast from existing loads.
+
+    This one-off script will:
+    1. Stream the 'posted_date' of every document in the 'loads' collection.
+    2. Count the loads posted on each UTC day.
+    3. Write one document per day to the daily counters collection, overwriting
+       any existing counter for that day with the exact count.
+
+    New loads keep the counters up to date on their own, so this only needs to be
+    run once for loads created before the counters existed.
+    """
+    if not db:
+        print("🔥 Firestore database is not initialized. Please check your Firebase credentials.")
+        return
+
+    print(f"📊 Rebuilding '{DAILY_COUNTS_COLLECTION}' from the 'loads' collection...")
+    counts = backfill_daily_counts(db)
+
+    if not counts:
+        print("⚠️ No loads with a posted_date were found. Nothing to backfill.")
+        return
+
+    print(f"  - {sum(counts.values())} loads over {len(counts)} days ({min(counts)} to {max(counts)})")
+    print("\n✅ Daily load counters backfilled successfully!")
+
+if __name__ == "__main__":
+    backfill_load_stats()
@@ -0,0 +1,211 @@
+"""
+Microbenchmarks for the functions on the backend's request paths.
+
+Runs fully offline (no Firestore connection needed) and prints the results as JSON:
+
+    python benchmarks/bench_backend.py --output bench.json
+    python benchmarks/bench_backend.py --compare bench.json   # show ratios against a previous run
+    python benchmarks/bench_backend.py --quick --filter jwt
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Add project root to the Python path to allow imports from 'backend'
+project_root = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# Tokens can't be created or verified without a key; a fixed one keeps runs comparable.
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-for-offline-runs-only")
+
+from pydantic import TypeAdapter
+
+from backend import security
+from backend.hashing import BCRYPT_ROUNDS
+from backend.models import LoadRead
+from backend.forecasting import daily_series_from_counts, forecast_daily_loads, forecast_with_budget
+from backend.synthetic import generate_daily_counts, generate_loads
+
+
+def measure(func, repeat: int, number: int = 1) -> dict:
+    """
+    Calls `func` `number` times per sample for `repeat` samples, after one warm-up call.
+    Returns timing statistics in seconds per call.
+    """
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "p95_s": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def bench_jwt(quick: bool) -> list[dict]:
+    token = security.create_access_token({"sub": "loader1@test.com", "role": "loader", "name": "Test Loader"})
+
+    def decode_uncached():
+        security.token_memo.clear()
+        security.decode_access_token(token)
+
+    security.token_memo.clear()
+    security.decode_access_token(token)
+    repeat = 5 if quick else 20
+    return [
+        {"name": "jwt.create_access_token", "params": {},
+         **measure(lambda: security.create_access_token({"sub": "loader1@test.com", "role": "loader"}), repeat, 1000)},
+        {"name": "jwt.decode", "params": {"memo": False}, **measure(decode_uncached, repeat, 1000)},
+        {"name": "jwt.decode", "params": {"memo": True},
+         **measure(lambda: security.decode_access_token(token), repeat, 1000)},
+    ]
+
+
+def bench_bcrypt(quick: bool) -> list[dict]:
+    hashed = security.get_password_hash("password123")
+    return [
+        {"name": "bcrypt.verify_password", "params": {"rounds": BCRYPT_ROUNDS},
+         **measure(lambda: security.verify_password("password123", hashed), 3 if quick else 10)},
+    ]
+
+
+def bench_load_validation(quick: bool) -> list[dict]:
+    adapter = TypeAdapter(list[LoadRead])
+    sizes = (100, 10_000) if quick else (100, 10_000, 100_000)
+    rows = [
+        {**load, "id": f"load_{index}"}
+        for index, load in enumerate(generate_loads(max(sizes), ["shipper1@test.com"], ["loader1@test.com"], seed=1))
+    ]
+    results = []
+    for size in sizes:
+        subset = rows[:size]
+        repeat = 3 if size >= 100_000 or quick else 10
+        results.append({"name": "pydantic.validate_load_list", "params": {"rows": size},
+                        **measure(lambda: adapter.validate_python(subset), repeat)})
+    return results
+
+
+def bench_forecast(quick: bool) -> list[dict]:
+    lengths = (30, 180) if quick else (30, 90, 180, 365, 730)
+    results = []
+    for days in lengths:
+        counts = generate_daily_counts(days, seed=days)
+        results.append({"name": "forecast.pipeline", "params": {"days": days},
+                        **measure(lambda: forecast_daily_loads(daily_series_from_counts(counts)), 2 if quick else 5)})
+        series = daily_series_from_counts(counts)
+        for model in ("holt_winters", "seasonal_naive"):
+            results.append({"name": "forecast.model", "params": {"days": days, "model": model},
+                            **measure(lambda: forecast_with_budget(series, model=model), 2 if quick else 5)})
+    return results
+
+
+def bench_recommend(quick: bool) -> list[dict]:
+    from backend.load_board import BoardEntry
+    from backend.recommendations import LoadColumns, recommend
+
+    sizes = (10_000,) if quick else (10_000, 100_000)
+    rows = [
+        BoardEntry(**{field: load.get(field) for field in BoardEntry._fields if field != "id"}, id=f"load_{index}")
+        for index, load in enumerate(generate_loads(max(sizes), ["shipper1@test.com"], ["loader1@test.com"], seed=2))
+    ]
+    results = []
+    for size in sizes:
+        columns = LoadColumns(rows[:size])
+        results.append({"name": "recommend.build_columns", "params": {"rows": size},
+                        **measure(lambda: LoadColumns(rows[:size]), 3)})
+        results.append({"name": "recommend.top_k", "params": {"rows": size, "k": 20},
+                        **measure(lambda: recommend(columns, 20, 19.076, 72.8777, 20000, {"Steel", "Cement"}),
+                                  5 if quick else 20)})
+    return results
+
+
+BENCHMARKS = {
+    "jwt": bench_jwt,
+    "bcrypt": bench_bcrypt,
+    "validation": bench_load_validation,
+    "forecast": bench_forecast,
+    "recommend": bench_recommend,
+}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _result_key(result: dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Prints the median time of each benchmark relative to a previous run."""
+    previous = {_result_key(result): result for result in baseline["results"]}
+    print(f"{'benchmark':<55} {'baseline':>12} {'current':>12} {'ratio':>7}", file=sys.stderr)
+    for result in current["results"]:
+        before = previous.get(_result_key(result))
+        label = result["name"] + (" " + json.dumps(result["params"]) if result["params"] else "")
+        if before is None:
+            print(f"{label:<55} {'-':>12} {result['median_s'] * 1e6:>10.1f}us {'new':>7}", file=sys.stderr)
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        print(f"{label:<55} {before['median_s'] * 1e6:>10.1f}us {result['median_s'] * 1e6:>10.1f}us {ratio:>6.2f}x",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the backend's hot functions.")
+    parser.add_argument("--filter", action="append", choices=sorted(BENCHMARKS),
+                        help="only run these benchmark groups (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions and smaller inputs")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="a previous JSON results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.filter or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        results.extend(BENCHMARKS[name](args.quick))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(report, json.loads(pathlib.Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
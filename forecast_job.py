@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import pathlib
+import time
+from dotenv import load_dotenv
+
+# Explicitly find and load the .env file in the project root.
+project_root = pathlib.Path(__file__).parent
+dotenv_path = project_root / ".env"
+if dotenv_path.is_file():
+    load_dotenv(dotenv_path=dotenv_path)
+
+# Add project root to the Python path to allow imports from 'backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+try:
+    from backend.database import db
+    from backend.forecasting import FORECAST_DAYS, SEGMENT_FIELDS, shutdown_forecast_pool
+    from backend.forecast_jobs import (
+        FORECAST_JOB_SEGMENTS, FORECASTS_COLLECTION, GLOBAL_FORECAST_ID, compute_global_forecast,
+        compute_segment_forecasts, write_forecast
+    )
+except ImportError as e:
+    print(f"Error importing backend modules: {e}")
+    print("Please ensure you are running this script from the project root directory.")
+    sys.exit(1)
+
+
+def run_forecast_job(segmentations: list[str], horizon: int = FORECAST_DAYS, top: int = 50,
+                     history_days: int = 180, budget_ms: float | None = None, dry_run: bool = False):
+    """
+    Precomputes the load forecasts served by /predictions.
+
+    This will:
+    1. Forecast the daily load total from the daily counters.
+    2. Forecast the busiest `top` segments of each of `segmentations` ('lane', 'material'),
+       fitted in parallel across the forecast worker pool.
+    3. Write each result with its generation time to the 'forecasts' collection,
+       replacing the previous run's documents.
+
+    Run it on a schedule (e.g. hourly from cron) so dashboards never wait for a model fit.
+    """
+    if not db:
+        print("🔥 Firestore database is not initialized. Please check your Firebase credentials.")
+        return
+
+    jobs = [(GLOBAL_FORECAST_ID, lambda: compute_global_forecast(db, horizon, "auto", budget_ms))]
+    for by in segmentations:
+        jobs.append((by, lambda by=by: compute_segment_forecasts(db, by, top, history_days, horizon, "auto", budget_ms)))
+
+    print(f"📈 Computing {len(jobs)} forecast(s) into '{FORECASTS_COLLECTION}'...")
+    try:
+        for forecast_id, compute in jobs:
+            started = time.perf_counter()
+            forecast = compute()
+            if forecast is None:
+                print(f"⚠️ No load data for the '{forecast_id}' forecast. Skipping it.")
+                continue
+            if "segments" in forecast:
+                failed = sum(1 for segment in forecast["segments"] if segment["error"])
+                summary = f"{len(forecast['segments'])} segments, {failed} failed"
+            else:
+                summary = f"model {forecast['model']}"
+            if not dry_run:
+                write_forecast(db, forecast_id, forecast)
+            print(f"  - {forecast_id}: {summary} in {time.perf_counter() - started:.1f}s")
+    finally:
+        shutdown_forecast_pool()
+
+    print("\n✅ Forecasts computed successfully!" if not dry_run else "\n✅ Dry run finished; nothing was written.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute load forecasts into the 'forecasts' collection.")
+    parser.add_argument("--segments", nargs="*", choices=sorted(SEGMENT_FIELDS), default=FORECAST_JOB_SEGMENTS,
+                        help="segment forecasts to compute besides the global one (default: FORECAST_JOB_SEGMENTS)")
+    parser.add_argument("--horizon", type=int, default=FORECAST_DAYS, help=f"days to forecast (default: {FORECAST_DAYS})")
+    parser.add_argument("--top", type=int, default=50, help="busiest segments to forecast per segmentation (default: 50)")
+    parser.add_argument("--history-days", type=int, default=180, help="days of history for segment forecasts (default: 180)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="time budget of each model fit (default: none)")
+    parser.add_argument("--dry-run", action="store_true", help="compute the forecasts without writing them")
+    args = parser.parse_args()
+    run_forecast_job(args.segments, args.horizon, args.top, args.history_days, args.budget_ms, args.dry_run)
@@ -1,7 +1,10 @@
+import argparse
 import json
 import os
 import sys
 import pathlib
+import time
+from collections import Counter
 from dotenv import load_dotenv
 
 # Explicitly find and load the .env file in the project root.
@@ -15,42 +18,44 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
 
 try:
     from backend.database import db
-    from backend.security import get_password_hash
+    from backend.hashing import get_password_hash
     from backend.models import User
+    from backend.load_stats import DAILY_COUNTS_COLLECTION, MAX_BATCH_SIZE, day_increment, day_key
+    from backend.synthetic import generate_loads
 except ImportError as e:
     print(f"Error importing backend modules: {e}")
     print("Please ensure you are running this script from the project root directory.")
     sys.exit(1)
 
+DEFAULT_PASSWORD = "password123"
 
-def seed_database():
+
+def seed_users(users_file: str = 'user.json') -> list[User]:
     """
     Seeds the Firestore database with users from user.json.
 
-    This script will:
+    This will:
     1. Read the user data from user.json.
-    2. For each user, assign a default password 'password123'.
-    3. Hash the password.
-    4. Add the user to the 'users' collection in your Firestore database.
+    2. Hash the default password 'password123' once and give it to every user.
+    3. Write the users to the 'users' collection in batches of up to 500.
        It will overwrite existing users with the same email.
-    """
-    if not db:
-        print("🔥 Firestore database is not initialized. Please check your Firebase credentials.")
-        return
 
+    Returns the seeded users.
+    """
     try:
-        with open('user.json', 'r') as f:
+        with open(users_file, 'r') as f:
             users_to_seed = json.load(f)
     except FileNotFoundError:
-        print("❌ Error: user.json not found in the project root directory.")
-        return
+        print(f"❌ Error: {users_file} not found in the project root directory.")
+        return []
     except json.JSONDecodeError:
-        print("❌ Error: Could not decode user.json. Please ensure it is valid JSON.")
-        return
+        print(f"❌ Error: Could not decode {users_file}. Please ensure it is valid JSON.")
+        return []
 
-    print("🌱 Starting to seed database...")
-    users_collection = db.collection('users')
+    # bcrypt is deliberately slow, and every user gets the same default password.
+    hashed_password = get_password_hash(DEFAULT_PASSWORD)
 
+    users = []
     for user_data in users_to_seed:
         email = user_data.get("email")
         if not email:
@@ -64,17 +69,92 @@ def seed_database():
             continue
 
         print(f"  - Processing user: {email} ({user_data.get('role')})")
-        hashed_password = get_password_hash("password123")
-        user_db = User(
+        users.append(User(
             email=email,
             role=user_data["role"],
             user_name=user_name,
             hashed_password=hashed_password,
             gst_number=None  # Explicitly set optional fields to ensure schema consistency
-        )
-        users_collection.document(email).set(user_db.model_dump())
+        ))
+
+    users_collection = db.collection('users')
+    batch = db.batch()
+    for user in users:
+        batch.set(users_collection.document(user.email), user.model_dump())
+        if len(batch) >= MAX_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+    if len(batch):
+        batch.commit()
+
+    return users
+
+
+def seed_loads(count: int, users: list[User], days: int, seed: int | None, dry_run: bool = False) -> Counter:
+    """
+    Generates `count` synthetic loads and writes them to the 'loads' collection with a
+    BulkWriter, which batches and parallelizes the writes. The daily load counters are
+    bumped once per day at the end. Returns the number of loads per day.
+    """
+    shipper_ids = [user.email for user in users if user.role == 'shipper'] or ["shipper1@test.com"]
+    loader_ids = [user.email for user in users if user.role == 'loader'] or ["loader1@test.com"]
+
+    per_day = Counter()
+    writer = None if dry_run else db.bulk_writer()
+    loads_collection = None if dry_run else db.collection('loads')
+
+    started = time.perf_counter()
+    for index, load in enumerate(generate_loads(count, shipper_ids, loader_ids, days=days, seed=seed), start=1):
+        per_day[day_key(load["posted_date"])] += 1
+        if writer is not None:
+            writer.create(loads_collection.document(), load)
+        if index % 10000 == 0:
+            print(f"  - {index} loads generated ({index / (time.perf_counter() - started):.0f}/s)")
+
+    if writer is not None:
+        writer.close()
+        counters = db.collection(DAILY_COUNTS_COLLECTION)
+        batch = db.batch()
+        for key, day_count in sorted(per_day.items()):
+            batch.set(counters.document(key), day_increment(key, day_count), merge=True)
+            if len(batch) >= MAX_BATCH_SIZE:
+                batch.commit()
+                batch = db.batch()
+        if len(batch):
+            batch.commit()
+
+    print(f"  - {count} loads over {len(per_day)} days in {time.perf_counter() - started:.1f}s")
+    return per_day
+
+
+def seed_database(load_count: int = 0, days: int = 180, seed: int | None = None,
+                  skip_users: bool = False, dry_run: bool = False):
+    """
+    Seeds the Firestore database with the users from user.json and, optionally,
+    `load_count` synthetic loads spread over the last `days` days.
+
+    With `dry_run`, loads are only generated (e.g. to time the generator) and nothing is written.
+    Set FIRESTORE_EMULATOR_HOST to seed a local Firestore emulator instead of the real project.
+    """
+    if not db and not dry_run:
+        print("🔥 Firestore database is not initialized. Please check your Firebase credentials.")
+        return
+
+    print("🌱 Starting to seed database...")
+    users = [] if skip_users or dry_run else seed_users()
+
+    if load_count:
+        print(f"🚚 Generating {load_count} synthetic loads...")
+        seed_loads(load_count, users, days, seed, dry_run=dry_run)
 
     print("\n✅ Database seeding completed successfully!")
 
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed Firestore with test users and synthetic loads.")
+    parser.add_argument("--loads", type=int, default=0, help="number of synthetic loads to create (default: 0)")
+    parser.add_argument("--days", type=int, default=180, help="spread posted dates over this many days (default: 180)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    parser.add_argument("--skip-users", action="store_true", help="do not (re)write the users from user.json")
+    parser.add_argument("--dry-run", action="store_true", help="generate loads without writing anything")
+    args = parser.parse_args()
+    seed_database(args.loads, args.days, args.seed, args.skip_users, args.dry_run)
@@ -1,8 +1,14 @@
+import asyncio
+import json
+import subprocess
 import sys
+import time
 import os
 import pytest
+from datetime import datetime, timedelta, timezone
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+from google.api_core.exceptions import FailedPrecondition
 
 # Add project root to the Python path to allow imports from 'backend'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -11,9 +17,29 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # This is a crucial step to prevent a real Firebase connection during tests.
 mock_db = MagicMock()
 
-with patch('backend.database.db', mock_db):
+from backend.database import Instrumented  # noqa: E402
+
+with patch('backend.database.db', Instrumented(mock_db)), patch('backend.database.store', Instrumented(mock_db)):
     from backend.main import app
-    from backend.security import get_password_hash
+    from backend.security import user_cache, token_memo
+    from backend.routers.predictions import forecast_cache
+    from backend.hashing import HashingPool, get_password_hash, hashing_pool, pwd_context, verify_password
+    from backend.routers.loads import _invalidate_load_lists, _load_list_key, accept_stats, load_list_cache
+    from backend.cache import TTLCache
+    from backend.load_board import BoardEntry, LoadBoard, load_board
+    from backend.models import LoadRead
+    from backend.synthetic import generate_loads
+    from backend.geo import encode_geohash, geocode, haversine_km, load_coordinates
+    from backend.database import FirestoreUsage, LazyClient, call_firestore, firestore_usage, get_documents, stream_documents
+    from backend.metrics import MetricsMiddleware, RequestMetrics, request_metrics
+    from backend.forecasting import (
+        FitBudgetExceeded, _fit_ms_per_day, daily_series_from_counts, forecast_daily_loads, forecast_with_budget,
+        shutdown_forecast_pool
+    )
+    from backend.forecast_jobs import compute_global_forecast
+    from backend.load_stats import backfill_daily_counts
+    from backend.rate_limit import AUTH_USER_BURST, LoginRateLimiter, RateLimitBackend, login_limiter
+    from backend.recommendations import CandidateCache, LoadColumns, candidate_cache, score_loads, top_k
 
 client = TestClient(app)
 
@@ -60,6 +86,13 @@ def reset_db_mock():
     Reset the mock database before each test to ensure test isolation.
     """
     mock_db.reset_mock()
+    user_cache.clear()
+    token_memo.clear()
+    forecast_cache.clear()
+    candidate_cache.clear()
+    load_list_cache.clear()
+    asyncio.run(login_limiter.reset())
+    load_board.stop()
 
 
 def get_auth_token(user_data):
@@ -171,6 +204,160 @@ def test_login_failure_wrong_password():
     assert response.json() == {"detail": "Incorrect email or password"}
 
 
+def test_current_user_is_cached_between_requests(authenticated_user_mock):
+    """Test that a verified user is served from the cache instead of Firestore."""
+    token = get_auth_token(TEST_SHIPPER_USER)
+    authenticated_user_mock(TEST_SHIPPER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    mock_db.collection.return_value.where.return_value.order_by.return_value.stream.return_value = []
+    user_get = mock_db.collection.return_value.document.return_value.get
+    user_get.reset_mock()
+
+    first = client.get("/loads/shipper/me", headers=headers)
+    second = client.get("/loads/shipper/me", headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert user_get.call_count == 1
+    assert user_cache.stats()["hits"] == 1
+
+def test_register_invalidates_cached_user(authenticated_user_mock):
+    """Test that registering an email drops any cached user for it."""
+    token = get_auth_token(TEST_SHIPPER_USER)
+    authenticated_user_mock(TEST_SHIPPER_USER)
+    mock_db.collection.return_value.where.return_value.order_by.return_value.stream.return_value = []
+    client.get("/loads/shipper/me", headers={"Authorization": f"Bearer {token}"})
+    assert user_cache.get(TEST_SHIPPER_USER["email"]) is not None
+
+    mock_user_get = MagicMock()
+    mock_user_get.exists = False
+    mock_db.collection.return_value.document.return_value.get.return_value = mock_user_get
+    client.post("/auth/register", json=TEST_SHIPPER_USER)
+
+    assert user_cache.get(TEST_SHIPPER_USER["email"]) is None
+
+def test_users_me_uses_token_claims_only():
+    """Test that /users/me is answered from the token without any database reads."""
+    token = get_auth_token(TEST_LOADER_USER)
+    mock_db.reset_mock()
+
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "email": TEST_LOADER_USER["email"],
+        "role": TEST_LOADER_USER["role"],
+        "user_name": TEST_LOADER_USER["user_name"],
+    }
+    mock_db.collection.assert_not_called()
+    assert token_memo.get(token) is not None
+
+def test_invalid_token_is_rejected():
+    """Test that a token with a bad signature is rejected by the token principal."""
+    response = client.get("/users/me", headers={"Authorization": "Bearer not-a-real-token"})
+    assert response.status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash():
+    """Test that a hash made with another bcrypt cost is upgraded on successful login."""
+    outdated_hash = pwd_context.handler("bcrypt").using(rounds=4).hash(TEST_SHIPPER_USER["password"])
+    mock_user_get = MagicMock()
+    mock_user_get.exists = True
+    mock_user_get.to_dict.return_value = {
+        "email": TEST_SHIPPER_USER["email"],
+        "hashed_password": outdated_hash,
+        "role": TEST_SHIPPER_USER["role"],
+        "user_name": TEST_SHIPPER_USER["user_name"],
+    }
+    mock_db.collection.return_value.document.return_value.get.return_value = mock_user_get
+
+    response = client.post(
+        "/auth/token",
+        data={"username": TEST_SHIPPER_USER["email"], "password": TEST_SHIPPER_USER["password"]},
+    )
+
+    assert response.status_code == 200
+    update = mock_db.collection.return_value.document.return_value.update
+    update.assert_called_once()
+    new_hash = update.call_args.args[0]["hashed_password"]
+    assert not pwd_context.needs_update(new_hash)
+    assert pwd_context.verify(TEST_SHIPPER_USER["password"], new_hash)
+
+def test_login_rejected_when_hashing_pool_is_full():
+    """Test that logins are shed with a 503 once the hashing queue limit is reached."""
+    mock_user_get = MagicMock()
+    mock_user_get.exists = True
+    mock_user_get.to_dict.return_value = {
+        "email": TEST_SHIPPER_USER["email"],
+        "hashed_password": get_password_hash(TEST_SHIPPER_USER["password"]),
+        "role": TEST_SHIPPER_USER["role"],
+        "user_name": TEST_SHIPPER_USER["user_name"],
+    }
+    mock_db.collection.return_value.document.return_value.get.return_value = mock_user_get
+
+    with patch.object(hashing_pool, "max_pending", 0):
+        response = client.post(
+            "/auth/token",
+            data={"username": TEST_SHIPPER_USER["email"], "password": TEST_SHIPPER_USER["password"]},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert hashing_pool.stats()["rejected"] >= 1
+
+def test_login_throttled_per_username_before_any_lookup():
+    """Test that repeated logins for one account get a 429 with Retry-After, without a database read."""
+    mock_user_get = MagicMock()
+    mock_user_get.exists = False
+    user_get = mock_db.collection.return_value.document.return_value.get
+    user_get.return_value = mock_user_get
+    attempt = {"username": "victim@test.com", "password": "guess"}
+
+    responses = [client.post("/auth/token", data=attempt) for _ in range(int(AUTH_USER_BURST) + 1)]
+    reads = user_get.call_count
+    other_user = client.post("/auth/token", data={**attempt, "username": "someone@test.com"})
+
+    assert [response.status_code for response in responses[:-1]] == [401] * int(AUTH_USER_BURST)
+    assert responses[-1].status_code == 429
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+    assert reads == AUTH_USER_BURST
+    assert other_user.status_code == 401
+    assert login_limiter.stats()["throttled"] == 1
+
+def test_throttled_client_does_not_spend_the_username_bucket():
+    """Test that attempts refused per IP leave the account's own attempts untouched."""
+    limiter = LoginRateLimiter(ip_rate_per_minute=1, ip_burst=1, user_rate_per_minute=1, user_burst=2)
+
+    async def attempts():
+        attacker = [await limiter.check("10.0.0.1", "victim@test.com") for _ in range(5)]
+        owner = [await limiter.check("10.0.0.2", "victim@test.com") for _ in range(2)]
+        return attacker, owner
+
+    attacker, owner = asyncio.run(attempts())
+
+    assert attacker[0] is None and all(wait for wait in attacker[1:])
+    assert owner == [None, 60]
+
+def test_rate_limit_backend_must_implement_every_method():
+    """Test that an incomplete rate limit backend fails when it is constructed."""
+    class TakeOnlyBackend(RateLimitBackend):
+        async def take(self, key, rate_per_second, burst):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        TakeOnlyBackend()
+
+def test_hashing_pool_workers_are_not_forked_from_the_api_process():
+    """Test that hashing workers start from a clean interpreter, not a fork of the threaded app."""
+    pool = HashingPool(max_workers=1)
+    try:
+        start_method = pool._get_executor()._mp_context.get_start_method()
+        assert start_method in ("forkserver", "spawn")
+        assert asyncio.run(pool.run(verify_password, "password123", get_password_hash("password123")))
+    finally:
+        pool.shutdown()
+
+
 # === Load Management Tests (routers/loads.py) ===
 
 def test_post_load_success():
@@ -185,13 +372,12 @@ def test_post_load_success():
         "material_type": "General Goods",
     }
 
-    # Mock the .add() method which is used in post_load
-    # It returns a tuple (timestamp, document_reference)
-    mock_load_ref = MagicMock()
-    mock_load_ref.id = "new_load_id_123"
-    mock_db.collection.return_value.add.return_value = (None, mock_load_ref)
+    # The load gets an auto-generated document reference and is written in a batch
+    mock_load_ref = mock_db.collection.return_value.document.return_value
+    mock_batch = mock_db.batch.return_value
 
-    response = client.post("/loads/", json=load_data, headers=headers)
+    with patch.object(mock_load_ref, "id", "new_load_id_123"):
+        response = client.post("/loads/", json=load_data, headers=headers)
 
     assert response.status_code == 201
     data = response.json()
@@ -199,8 +385,11 @@ def test_post_load_success():
     assert data["load_id"] == "new_load_id_123"
     assert data["message"] == "Load posted successfully"
     
-    # Assert that .add() was called, not .set()
-    mock_db.collection.return_value.add.assert_called_once()
+    # Assert that the load and the day's counter were committed together
+    assert mock_batch.set.call_args_list[0].args[0] is mock_load_ref
+    assert mock_batch.set.call_count == 2
+    mock_batch.commit.assert_called_once()
+    mock_db.collection.return_value.add.assert_not_called()
 
 def test_get_available_loads(authenticated_user_mock):
     """Test that available loads can be retrieved."""
@@ -322,4 +511,841 @@ def test_accept_load_not_found():
     response = client.put(f"/loads/{load_id}/accept", headers=headers)
 
     assert response.status_code == 404
-    assert response.json() == {"detail": "Load not found"}
\ No newline at end of file
+    assert response.json() == {"detail": "Load not found"}
+
+def test_accept_load_uses_native_async_client(authenticated_user_mock):
+    """Test that handlers await the AsyncClient directly when it is available."""
+    token = get_auth_token(TEST_LOADER_USER)
+    authenticated_user_mock(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    load_id = "async_load_1"
+
+    mock_load_get = MagicMock()
+    mock_load_get.exists = True
+    mock_load_get.to_dict.return_value = {"status": "stand by"}
+    async_store = MagicMock()
+    async_doc_ref = async_store.collection.return_value.document.return_value
+    async_doc_ref.get = AsyncMock(return_value=mock_load_get)
+    async_doc_ref.update = AsyncMock()
+
+    with patch("backend.routers.loads.store", async_store):
+        response = client.put(f"/loads/{load_id}/accept", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "Load accepted", "load_id": load_id}
+    async_doc_ref.get.assert_awaited_once()
+    async_doc_ref.update.assert_awaited_once_with({
+        "status": "transit",
+        "loader_id": TEST_LOADER_USER["email"]
+    }, option=async_store.write_option.return_value)
+    async_store.write_option.assert_called_once_with(last_update_time=mock_load_get.update_time)
+
+def test_accept_load_retries_after_losing_a_race(authenticated_user_mock):
+    """Test that a conflicting write is retried and the loser sees the load as taken."""
+    token = get_auth_token(TEST_LOADER_USER)
+    authenticated_user_mock(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first_read = MagicMock(exists=True)
+    first_read.to_dict.return_value = {"status": "stand by"}
+    second_read = MagicMock(exists=True)
+    second_read.to_dict.return_value = {"status": "transit", "loader_id": "other@example.com"}
+    async_store = MagicMock()
+    async_doc_ref = async_store.collection.return_value.document.return_value
+    async_doc_ref.get = AsyncMock(side_effect=[first_read, second_read])
+    async_doc_ref.update = AsyncMock(side_effect=FailedPrecondition("stale update_time"))
+    accept_stats.clear()
+
+    with patch("backend.routers.loads.store", async_store):
+        response = client.put("/loads/hot_load/accept", headers=headers)
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Load not available"}
+    assert async_doc_ref.update.await_count == 1
+    assert accept_stats["conflicts"] == 1
+    assert accept_stats["retries"] == 1
+
+def make_load_doc(load_id, **overrides):
+    """Builds a mock Firestore snapshot of a complete load document."""
+    data = {
+        "shipper_id": TEST_SHIPPER_USER["email"],
+        "origin": "Mumbai, India",
+        "destination": "Delhi, India",
+        "material_type": "General Goods",
+        "weight": 10000,
+        "status": "stand by",
+        "loader_id": None,
+        "posted_date": "2024-01-01T00:00:00+00:00",
+    }
+    data.update(overrides)
+    doc = MagicMock()
+    doc.id = load_id
+    doc.exists = True
+    doc.to_dict.return_value = data
+    return doc
+
+def test_get_available_loads_paginated():
+    """Test that a full page of available loads advertises the next cursor."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    query = mock_db.collection.return_value.where.return_value.order_by.return_value
+    query.start_after.return_value.limit.return_value.stream.return_value = [
+        make_load_doc("load_3"), make_load_doc("load_4")
+    ]
+
+    response = client.get("/loads/available?limit=2&cursor=load_2", headers=headers)
+
+    assert response.status_code == 200
+    assert [load["id"] for load in response.json()] == ["load_3", "load_4"]
+    assert response.headers["X-Next-Cursor"] == "load_4"
+    query.start_after.assert_called_once_with({"__name__": "load_2"})
+    query.start_after.return_value.limit.assert_called_once_with(2)
+
+def test_get_available_loads_ndjson_stream():
+    """Test that available loads can be streamed as newline-delimited JSON."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    mock_db.collection.return_value.where.return_value.stream.return_value = [
+        make_load_doc("load_1"), make_load_doc("load_2")
+    ]
+
+    response = client.get("/loads/available?format=ndjson", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["load_1", "load_2"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_get_available_loads_summary_view():
+    """Test that view=summary selects only the summary fields and returns slim loads."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    query = mock_db.collection.return_value.where.return_value
+    query.select.return_value.stream.return_value = [make_load_doc("load_1"), make_load_doc("load_2")]
+
+    response = client.get("/loads/available?view=summary", headers=headers)
+
+    assert response.status_code == 200
+    query.select.assert_called_once_with(["origin", "destination", "weight", "status"])
+    assert response.json()[0] == {
+        "id": "load_1", "origin": "Mumbai, India", "destination": "Delhi, India",
+        "weight": 10000, "status": "stand by",
+    }
+
+def test_get_my_active_loads_selected_fields():
+    """Test that fields= projects the active loads onto the requested fields plus the ID."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    query = mock_db.collection.return_value.where.return_value
+    query.select.return_value.stream.return_value = [make_load_doc("load_1", status="transit")]
+
+    response = client.get("/loads/my-active?fields=status,origin", headers=headers)
+
+    assert response.status_code == 200
+    query.select.assert_called_once_with(["origin", "status"])
+    assert response.json() == [{"id": "load_1", "origin": "Mumbai, India", "status": "transit"}]
+
+    response = client.get("/loads/my-active?fields=origin,price", headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown load fields: price"}
+
+def test_get_my_active_loads_etag_and_cache():
+    """Test that unchanged lists are cached per user and revalidated with a body-less 304."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    load_doc = make_load_doc("load_1", status="transit", loader_id=TEST_LOADER_USER["email"])
+    load_doc.update_time = "2024-01-01T00:00:00Z"
+    stream = mock_db.collection.return_value.where.return_value.stream
+    stream.return_value = [load_doc]
+
+    first = client.get("/loads/my-active", headers=headers)
+    etag = first.headers["ETag"]
+    not_modified = client.get("/loads/my-active", headers={**headers, "If-None-Match": etag})
+    assert stream.call_count == 1  # Served from the per-user cache
+
+    load_list_cache.clear()
+    load_doc.update_time = "2024-01-02T00:00:00Z"
+    changed = client.get("/loads/my-active", headers={**headers, "If-None-Match": f'W/{etag}'})
+
+    assert first.status_code == 200
+    assert [load["id"] for load in first.json()] == ["load_1"]
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+def test_load_list_generations_are_bounded():
+    """Test that per-user list generations are capped and a dropped one never revives old lists."""
+    request = MagicMock()
+    request.url.path = "/loads/my-active"
+    request.query_params = ""
+
+    with patch("backend.routers.loads._load_list_generations", TTLCache(maxsize=2, ttl=60)) as generations:
+        before_write = _load_list_key(request, "a@example.com")
+        _invalidate_load_lists("a@example.com")
+        for email in ("b@example.com", "c@example.com"):
+            _invalidate_load_lists(email)
+        after_eviction = _load_list_key(request, "a@example.com")
+
+    assert len(generations) == 2
+    assert after_eviction != before_write
+
+def test_create_loads_bulk_json():
+    """Test that a JSON array is validated per load and written in one batch with the daily counter."""
+    token = get_auth_token(TEST_SHIPPER_USER)
+    mock_db.collection.return_value.document.return_value.id = "bulk_load"
+    loads = [
+        {"origin": "Pune, India", "destination": "Goa, India", "weight": 5000, "material_type": "Steel"},
+        {"origin": "Pune, India", "destination": "Goa, India", "weight": "heavy", "material_type": "Steel"},
+        {"origin": "Mumbai, India", "destination": "Delhi, India", "weight": 700, "material_type": "FMCG"},
+    ]
+
+    response = client.post("/loads/bulk", json=loads, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [result["row"] for result in body["results"]] == [1, 2, 3]
+    assert body["results"][0]["load_id"] == "bulk_load"
+    assert body["results"][1]["error"].startswith("weight:")
+    batch = mock_db.batch.return_value
+    batch.commit.assert_called_once()
+    assert batch.set.call_count == 3  # two loads plus the counter increment
+    counter_payload = batch.set.call_args_list[-1].args[1]
+    assert counter_payload["count"].value == 2
+    assert batch.set.call_args_list[0].args[1]["shipper_id"] == TEST_SHIPPER_USER["email"]
+
+def test_create_loads_bulk_csv_upload():
+    """Test that a CSV file upload is parsed into loads and malformed uploads are reported."""
+    token = get_auth_token(TEST_SHIPPER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    mock_db.collection.return_value.document.return_value.id = "bulk_load"
+    csv_text = (
+        "origin,destination,material_type,weight,order_description\n"
+        'Pune,Goa,Steel,5000,"fragile, keep dry"\n'
+        "Nagpur,Raipur,Cement,12000,\n"
+    )
+
+    response = client.post("/loads/bulk", files={"file": ("loads.csv", csv_text, "text/csv")}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+    first_load = mock_db.batch.return_value.set.call_args_list[0].args[1]
+    assert first_load["order_description"] == "fragile, keep dry"
+    assert first_load["weight"] == 5000
+
+    response = client.post("/loads/bulk", content=b'[{"origin": "Pune"', headers={
+        **headers, "Content-Type": "application/json",
+    })
+    assert response.json()["results"] == [{"row": 1, "load_id": None, "error": "Unexpected end of JSON input"}]
+
+def test_transition_loads_batch(authenticated_user_mock):
+    """Test that a batch of transitions is read with one get_all, validated per load and committed once."""
+    authenticated_user_mock(TEST_LOADER_USER)
+    token = get_auth_token(TEST_LOADER_USER)
+    missing = MagicMock(exists=False, id="load_missing")
+    mock_db.get_all.return_value = [
+        make_load_doc("load_open"),
+        make_load_doc("load_taken", status="transit", loader_id="other@example.com"),
+        make_load_doc("load_mine", status="transit", loader_id=TEST_LOADER_USER["email"]),
+        missing,
+    ]
+
+    response = client.post("/loads/transitions", json={"items": [
+        {"load_id": "load_open", "action": "accept"},
+        {"load_id": "load_taken", "action": "accept"},
+        {"load_id": "load_mine", "action": "deliver"},
+        {"load_id": "load_missing", "status": "delivered"},
+        {"load_id": "load_open", "status": "lost"},
+    ]}, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    assert [(r["load_id"], r["status"], r["status_code"]) for r in body["results"]] == [
+        ("load_open", "transit", None),
+        ("load_taken", None, 400),
+        ("load_mine", "delivered", None),
+        ("load_missing", None, 404),
+        ("load_open", None, 400),
+    ]
+    assert body["results"][4]["error"] == "Duplicate load_id in batch"
+    mock_db.get_all.assert_called_once()
+    batch = mock_db.batch.return_value
+    batch.commit.assert_called_once()
+    assert [call.args[1] for call in batch.update.call_args_list] == [
+        {"status": "transit", "loader_id": TEST_LOADER_USER["email"]},
+        {"status": "delivered"},
+    ]
+
+def test_transition_loads_batch_retries_on_conflict(authenticated_user_mock):
+    """Test that a batch whose loads changed since the read is re-read and re-validated."""
+    authenticated_user_mock(TEST_LOADER_USER)
+    token = get_auth_token(TEST_LOADER_USER)
+    mock_db.get_all.side_effect = [
+        [make_load_doc("load_1"), make_load_doc("load_2")],
+        [make_load_doc("load_1"), make_load_doc("load_2", status="transit", loader_id="other@example.com")],
+    ]
+    mock_db.batch.return_value.commit.side_effect = [FailedPrecondition("stale update_time"), []]
+
+    response = client.post("/loads/transitions", json={"items": [
+        {"load_id": "load_1", "action": "accept"},
+        {"load_id": "load_2", "action": "accept"},
+    ]}, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == "transit"
+    assert results[1]["error"] == "Load not available"
+    assert mock_db.get_all.call_count == 2
+    # reset_mock() keeps side effects, so don't leak them into other tests.
+    mock_db.get_all.side_effect = None
+    mock_db.batch.return_value.commit.side_effect = None
+
+
+
+def make_snapshot_change(change_type, doc):
+    """Builds a mock Firestore DocumentChange for the load board listener."""
+    change = MagicMock()
+    change.type.name = change_type
+    change.document = doc
+    return change
+
+def test_get_available_loads_served_from_load_board():
+    """Test that the in-memory load board answers filtered queries without Firestore reads."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    load_board._on_snapshot(None, [
+        make_snapshot_change("ADDED", make_load_doc("load_1", origin="Pune, India")),
+        make_snapshot_change("ADDED", make_load_doc("load_2", origin="Mumbai, India")),
+        make_snapshot_change("ADDED", make_load_doc("load_3", origin="Mumbai, India", material_type="Steel")),
+    ], None)
+    # load_2 gets accepted by another driver and leaves the stand-by query
+    load_board._on_snapshot(None, [
+        make_snapshot_change("REMOVED", make_load_doc("load_2", status="transit")),
+    ], None)
+    mock_db.reset_mock()
+
+    response = client.get("/loads/available?origin=Mumbai, India", headers=headers)
+    everything = client.get("/loads/available", headers=headers)
+
+    assert response.status_code == 200
+    assert [load["id"] for load in response.json()] == ["load_3"]
+    assert [load["id"] for load in everything.json()] == ["load_1", "load_3"]
+    mock_db.collection.assert_not_called()
+
+
+def test_load_board_fans_out_deltas_to_subscribers():
+    """Test that snapshot changes are encoded once and delivered to every subscriber."""
+    load_board._on_snapshot(None, [make_snapshot_change("ADDED", make_load_doc("load_1"))], None)
+
+    async def scenario():
+        first, entries, version = load_board.subscribe()
+        second, _, _ = load_board.subscribe()
+        load_board._on_snapshot(None, [
+            make_snapshot_change("ADDED", make_load_doc("load_2")),
+            make_snapshot_change("REMOVED", make_load_doc("load_1")),
+        ], None)
+        first_batch = await asyncio.wait_for(first.queue.get(), 1)
+        second_batch = await asyncio.wait_for(second.queue.get(), 1)
+        load_board.unsubscribe(first)
+        load_board.unsubscribe(second)
+        return entries, version, first_batch, second_batch
+
+    entries, version, (batch_version, frames), second_batch = asyncio.run(scenario())
+
+    assert [entry.id for entry in entries] == ["load_1"]
+    assert batch_version == version + 1
+    assert second_batch[1] is frames
+    assert frames[0].startswith(b"event: added\n")
+    assert b'"id":"load_2"' in frames[0]
+    assert frames[1] == f'event: removed\nid: {batch_version}\ndata: {{"id": "load_1"}}\n\n'.encode()
+    assert load_board.subscriber_count == 0
+
+def test_geocoding_and_geohash_helpers():
+    """Test gazetteer lookups by name, alias and PIN code, and the geohash/distance helpers."""
+    assert geocode("Mumbai, India") == geocode("Andheri, Bombay") == (19.076, 72.8777)
+    assert geocode("Shivajinagar, Pune 411005") == geocode("Pune")
+    assert geocode("Atlantis") is None
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert 115 < haversine_km(*geocode("Mumbai"), *geocode("Pune")) < 125
+    coordinates = load_coordinates("Mumbai, India", "Atlantis")
+    assert coordinates["origin_geohash"].startswith("te7")
+    assert coordinates["destination_lat"] is None
+
+def test_get_nearby_loads_from_load_board():
+    """Test that a radius search returns only loads within the radius, nearest first."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    load_board._on_snapshot(None, [
+        make_snapshot_change("ADDED", make_load_doc(load_id, origin=origin, **load_coordinates(origin, "Delhi, India")))
+        for load_id, origin in [("thane", "Thane, India"), ("mumbai", "Mumbai, India"),
+                                ("pune", "Pune, India"), ("unknown", "Atlantis")]
+    ], None)
+    mock_db.reset_mock()
+
+    response = client.get("/loads/nearby?lat=19.08&lng=72.88&radius_km=50", headers=headers)
+
+    assert response.status_code == 200
+    assert [load["id"] for load in response.json()] == ["mumbai", "thane"]
+    assert response.json()[0]["distance_km"] < response.json()[1]["distance_km"] <= 50
+    mock_db.collection.assert_not_called()
+
+def make_board_entry(load_id, **fields):
+    """Builds a load board entry; fields that aren't given are None."""
+    return BoardEntry(**{**dict.fromkeys(BoardEntry._fields), "id": load_id, **fields})
+
+def test_score_loads_excludes_overweight_and_incompatible_loads():
+    """Test vectorized scoring: closer, fuller and fresher loads rank higher; misfits are left out."""
+    posted = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    columns = LoadColumns([
+        make_board_entry("far", weight=9000, material_type="Steel", posted_date=posted,
+                         **load_coordinates("Delhi, India", None)),
+        make_board_entry("near", weight=9000, material_type="Steel", posted_date=posted,
+                         **load_coordinates("Thane, India", None)),
+        make_board_entry("heavy", weight=25000, material_type="Steel", posted_date=posted,
+                         **load_coordinates("Mumbai, India", None)),
+        make_board_entry("chemicals", weight=9000, material_type="Chemicals", posted_date=posted,
+                         **load_coordinates("Mumbai, India", None)),
+        make_board_entry("light", weight=1000, material_type="Steel", posted_date=posted,
+                         **load_coordinates("Thane, India", None)),
+        make_board_entry("unplaced", weight=None, material_type=None, posted_date=None),
+    ])
+
+    scores, distances = score_loads(columns, 19.08, 72.88, 10000, {"Steel"}, now=posted.timestamp())
+
+    assert [columns.row(index)["id"] for index in top_k(scores, 10)] == ["near", "light", "far"]
+    assert [columns.row(index)["id"] for index in top_k(scores, 1)] == ["near"]
+    assert distances[1] < 50 < distances[0]
+
+def test_get_recommended_loads_from_load_board():
+    """Test that recommendations are ranked from the load board without Firestore reads."""
+    token = get_auth_token(TEST_LOADER_USER)
+    headers = {"Authorization": f"Bearer {token}"}
+    posted = datetime.now(timezone.utc)
+    load_board._on_snapshot(None, [
+        make_snapshot_change("ADDED", make_load_doc(load_id, origin=origin, posted_date=posted, weight=weight,
+                                                    **load_coordinates(origin, "Delhi, India")))
+        for load_id, origin, weight in [("pune", "Pune, India", 9000), ("thane", "Thane, India", 9000),
+                                        ("heavy", "Mumbai, India", 30000)]
+    ], None)
+    mock_db.reset_mock()
+
+    response = client.get("/loads/recommended?lat=19.08&lng=72.88&capacity_kg=10000&limit=5", headers=headers)
+
+    assert response.status_code == 200
+    assert [load["id"] for load in response.json()] == ["thane", "pune"]
+    assert response.json()[0]["score"] > response.json()[1]["score"]
+    mock_db.collection.assert_not_called()
+
+def test_get_recommended_loads_requires_load_board():
+    """Test that recommendations are refused, without scanning Firestore, while the load board is down."""
+    token = get_auth_token(TEST_LOADER_USER)
+    mock_db.reset_mock()
+
+    response = client.get("/loads/recommended?lat=19.08&lng=72.88", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 503
+    mock_db.collection.assert_not_called()
+
+def test_candidate_cache_runs_one_build_for_concurrent_misses():
+    """Test that callers missing the candidate cache together share a single build."""
+    cache = CandidateCache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        return cache.store(1, [])
+
+    async def get_all():
+        return await asyncio.gather(*(cache.get(1, build) for _ in range(5)))
+
+    results = asyncio.run(get_all())
+
+    assert len(builds) == 1
+    assert all(columns is results[0] for columns in results)
+    assert asyncio.run(cache.get(1, build)) is results[0]
+    assert len(builds) == 1
+
+def test_load_board_restarts_a_dead_listener():
+    """Test that a listener that stopped empties the board, ends streams and is restarted."""
+    board = LoadBoard()
+    client_stub = MagicMock()
+    query = client_stub.collection.return_value.where.return_value
+    first_watch, second_watch = MagicMock(is_active=True), MagicMock(is_active=True)
+    query.on_snapshot.side_effect = [first_watch, second_watch]
+
+    async def run():
+        board.start(client_stub)
+        board._on_snapshot(None, [make_snapshot_change("ADDED", make_load_doc("load_1"))], None)
+        subscription, _, _ = board.subscribe()
+        board.check_listener()  # Still streaming: nothing to do
+        first_watch.is_active = False
+        board.check_listener()
+        closed = await asyncio.wait_for(subscription.queue.get(), 1)
+        return closed
+
+    try:
+        closed = asyncio.run(run())
+        assert closed is None
+        assert not board.ready.is_set()
+        assert len(board) == 0
+        assert query.on_snapshot.call_count == 2
+        assert board.restarts == 1
+        board._on_snapshot(None, [make_snapshot_change("ADDED", make_load_doc("load_2"))], None)
+        assert board.ready.is_set()
+    finally:
+        board.stop()
+    second_watch.unsubscribe.assert_called_once()
+
+def test_stream_available_loads_requires_load_board():
+    """Test that the live stream is refused when the load board is not running."""
+    token = get_auth_token(TEST_LOADER_USER)
+
+    response = client.get("/loads/available/stream", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 503
+
+
+# === Forecast Tests (routers/predictions.py) ===
+
+def make_counter_docs(days):
+    """Builds mock daily counter documents for consecutive days starting 2024-01-01."""
+    docs = []
+    for day in range(days):
+        doc = MagicMock()
+        doc.id = f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}"
+        doc.to_dict.return_value = {"date": doc.id, "count": 5 + day % 7}
+        docs.append(doc)
+    return docs
+
+def test_load_forecast_is_cached_until_data_changes():
+    """Test that the fitted forecast is reused while the data watermark is unchanged."""
+    counters = mock_db.collection.return_value
+    counter_docs = make_counter_docs(56)
+    counters.order_by.return_value.stream.return_value = counter_docs
+    counters.order_by.return_value.limit.return_value.stream.return_value = counter_docs[-1:]
+
+    first = client.get("/predictions/loads-forecast")
+    forecast_cache.checked_at = 0.0  # Force the next request to re-check the watermark
+    second = client.get("/predictions/loads-forecast")
+
+    assert first.status_code == 200
+    assert len(first.json()["forecast"]) == 7
+    assert second.json() == first.json()
+    # The counter series was read for the initial fit only, and loads were never scanned.
+    assert counters.order_by.return_value.stream.call_count == 1
+    assert counters.order_by.return_value.limit.return_value.stream.call_count == 2
+    counters.stream.assert_not_called()
+
+def test_load_forecast_falls_back_to_a_faster_model():
+    """Test that sparse data or a tight budget is answered by a cheaper model, and reported."""
+    counters = mock_db.collection.return_value
+    counter_docs = make_counter_docs(10)
+    counters.order_by.return_value.stream.return_value = counter_docs
+    counters.order_by.return_value.limit.return_value.stream.return_value = counter_docs[-1:]
+
+    sparse = client.get("/predictions/loads-forecast?horizon=3")
+    forecast_cache.clear()
+    counters.order_by.return_value.stream.return_value = make_counter_docs(56)
+    tight = client.get("/predictions/loads-forecast?model=sarimax&budget_ms=10&horizon=14")
+
+    assert sparse.status_code == 200
+    assert sparse.json()["model"] == "seasonal_naive"
+    assert "days of data" in sparse.json()["fallback_reason"]
+    assert [day["date"] for day in sparse.json()["forecast"]] == ["2024-01-11", "2024-01-12", "2024-01-13"]
+    assert tight.status_code == 200
+    assert tight.json()["model"] in ("holt_winters", "seasonal_naive")
+    assert "budget" in tight.json()["fallback_reason"]
+    assert len(tight.json()["forecast"]) == 14
+
+def test_load_forecast_served_from_stored_result():
+    """Test that a fresh precomputed forecast is read once and cached, and a stale one is not served."""
+    counters = mock_db.collection.return_value
+    counter_docs = make_counter_docs(28)
+    counters.order_by.return_value.stream.return_value = counter_docs
+    counters.order_by.return_value.limit.return_value.stream.return_value = counter_docs[-1:]
+    stored_doc = MagicMock()
+    stored_doc.exists = True
+    counters.document.return_value.get.return_value = stored_doc
+
+    stored_doc.to_dict.return_value = compute_global_forecast(mock_db, horizon=14)
+    counters.order_by.return_value.stream.reset_mock()
+    stored = client.get("/predictions/loads-forecast")
+    cached = client.get("/predictions/loads-forecast")
+    # The cached document ages past FORECAST_MAX_AGE_SECONDS.
+    stored_doc.to_dict.return_value["generated_at"] = datetime.now(timezone.utc) - timedelta(days=30)
+    stale = client.get("/predictions/loads-forecast")
+
+    assert stored.status_code == 200
+    assert stored.json()["source"] == "stored"
+    assert len(stored.json()["forecast"]) == 7
+    assert stored.json()["data_through"] == counter_docs[-1].id
+    assert cached.json() == stored.json()
+    assert counters.document.return_value.get.call_count == 1
+    assert stale.json()["source"] == "computed"
+    # Only the stale read had to fall back to the daily counters.
+    assert counters.order_by.return_value.stream.call_count == 1
+    counters.document.assert_any_call("global")
+    counters.document.return_value.get.return_value = MagicMock()
+
+def test_load_forecast_not_enough_data():
+    """Test that a short history is reported as a client error."""
+    counters = mock_db.collection.return_value
+    counter_docs = make_counter_docs(3)
+    counters.order_by.return_value.stream.return_value = counter_docs
+    counters.order_by.return_value.limit.return_value.stream.return_value = counter_docs[-1:]
+
+    response = client.get("/predictions/loads-forecast")
+
+    assert response.status_code == 400
+    assert "Not enough data" in response.json()["detail"]
+
+def test_segment_forecasts_fit_busiest_segments_in_parallel():
+    """Test that loads are grouped per material and each busy segment gets its own forecast."""
+    docs = []
+    for load in generate_loads(1500, [TEST_SHIPPER_USER["email"]], [TEST_LOADER_USER["email"]], days=60, seed=5):
+        doc = MagicMock()
+        doc.to_dict.return_value = {key: load[key] for key in ("material_type", "posted_date")}
+        docs.append(doc)
+    mock_db.collection.return_value.where.return_value.select.return_value.stream.return_value = docs
+
+    response = client.get("/predictions/loads-forecast/segments?by=material&top=3&history_days=60")
+    shutdown_forecast_pool()
+
+    assert response.status_code == 200
+    segments = response.json()["segments"]
+    assert len(segments) == 3
+    assert segments[0]["loads"] >= segments[1]["loads"] >= segments[2]["loads"]
+    assert all(segment["error"] is None and len(segment["forecast"]) == 7 for segment in segments)
+    mock_db.collection.return_value.where.return_value.select.assert_called_once_with(["material_type", "posted_date"])
+
+def test_forecast_fit_stops_at_its_budget():
+    """Test that a fit still iterating past its budget is abandoned."""
+    series = daily_series_from_counts({f"2024-01-{day:02d}": day % 7 for day in range(1, 29)})
+
+    with pytest.raises(FitBudgetExceeded):
+        forecast_daily_loads(series, budget_seconds=0)
+
+def test_forecast_falls_back_when_holt_winters_overruns_its_budget():
+    """Test that a Holt-Winters fit past its budget is discarded and its cost still learned."""
+    series = daily_series_from_counts({f"2024-01-{day:02d}": day % 7 for day in range(1, 29)})
+
+    with patch.dict(_fit_ms_per_day, {"holt_winters": 0.0}), \
+            patch("backend.forecasting.MODEL_FIT_OVERHEAD_MS", {"sarimax": 0.0, "holt_winters": 0.0, "seasonal_naive": 0.0}):
+        result = forecast_with_budget(series, model="holt_winters", budget_ms=5)
+        learned_ms_per_day = _fit_ms_per_day["holt_winters"]
+
+    assert result["model"] == "seasonal_naive"
+    assert result["fallback_reason"] == "holt_winters did not fit within the 5 ms budget."
+    assert len(result["forecast"]) == 7
+    assert learned_ms_per_day > 0
+
+def test_create_load_increments_daily_counter():
+    """Test that posting a load bumps the day's counter with an atomic increment."""
+    token = get_auth_token(TEST_SHIPPER_USER)
+
+    response = client.post("/loads/", json={
+        "origin": "Pune, India",
+        "destination": "Goa, India",
+        "weight": 5000,
+        "material_type": "Steel",
+    }, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 201
+    mock_db.collection.assert_any_call("load_daily_counts")
+    counter_set = mock_db.batch.return_value.set.call_args_list[-1]
+    payload = counter_set.args[1]
+    assert payload["count"].value == 1
+    assert counter_set.kwargs == {"merge": True}
+
+
+# === Synthetic Data Tests (synthetic.py) ===
+
+def test_generate_loads_is_reproducible_and_valid():
+    """Test that synthetic loads are deterministic per seed and match the load schema."""
+    shippers, loaders = ["shipper1@test.com"], ["loader1@test.com"]
+    first = list(generate_loads(500, shippers, loaders, days=30, seed=7))
+    second = list(generate_loads(500, shippers, loaders, days=30, seed=7))
+
+    assert first == second
+    assert len({load["posted_date"].date() for load in first}) > 20
+    for index, load in enumerate(first):
+        LoadRead(**load, id=f"load_{index}")
+        assert load["origin"] != load["destination"]
+        assert (load["loader_id"] is None) == (load["status"] == "stand by")
+
+
+# === Metrics Tests (metrics.py) ===
+
+def test_metrics_labels_requests_by_route_template():
+    """Test that /metrics reports latency and status counts per route template, not per raw path."""
+    client.get("/")
+    client.put("/loads/some-load-id/accept")  # 401 without a token
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/"}' in body
+    assert 'http_responses_total{method="PUT",route="/loads/{load_id}/accept",status="401"}' in body
+    assert 'route="<unmatched>",status="404"' in body
+    assert "some-load-id" not in body
+    assert "http_requests_in_flight 1" in body
+    assert "threadpool_queue_depth 0" in body
+    assert "user_cache_hits" in body
+    assert "hashing_pool_pending" in body
+
+
+def test_metrics_time_responses_to_their_last_byte_and_streams_separately():
+    """Test that background tasks aren't timed and streams are timed to their first byte only."""
+    from fastapi import BackgroundTasks, FastAPI
+    from fastapi.responses import StreamingResponse
+
+    metrics = RequestMetrics()
+    timed_app = FastAPI()
+    timed_app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @timed_app.get("/refit")
+    def refit(background_tasks: BackgroundTasks):
+        background_tasks.add_task(time.sleep, 0.3)
+        return {}
+
+    @timed_app.get("/feed")
+    def feed():
+        def lines():
+            yield b"{}\n"
+            time.sleep(0.3)
+            yield b"{}\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    timed_client = TestClient(timed_app)
+    timed_client.get("/refit")
+    timed_client.get("/feed")
+
+    _buckets, refit_seconds, _count = metrics.latency._series[("GET", "/refit")]
+    _buckets, feed_seconds, _count = metrics.stream_latency._series[("GET", "/feed")]
+    assert refit_seconds < 0.3
+    assert feed_seconds < 0.3
+    assert ("GET", "/feed") not in metrics.latency._series
+    assert metrics.responses[("GET", "/feed", "200")] == 1
+    assert metrics.in_flight == 0 and metrics.streams_open == 0
+
+
+def test_firestore_calls_are_attributed_to_the_current_request():
+    """Test that the instrumented client counts reads, writes and calls on the request's usage."""
+    client = MagicMock()
+    client.collection.return_value.document.return_value.get.return_value = MagicMock()
+    client.batch.return_value.commit.return_value = [MagicMock(), MagicMock(), MagicMock()]
+    client.collection.return_value.where.return_value.stream.return_value = [MagicMock() for _ in range(5)]
+    client.get_all.return_value = [MagicMock(), MagicMock()]
+    store = Instrumented(client)
+
+    async def handler():
+        usage = FirestoreUsage()
+        firestore_usage.set(usage)
+        ref = store.collection("loads").document("load_1")
+        await call_firestore(ref.get)
+        batch = store.batch()
+        for _ in range(3):
+            batch.set(ref, {})
+        await call_firestore(batch.commit)
+        query = store.collection("loads").where("status", "==", "stand by")
+        docs = [doc async for doc in stream_documents(query, chunk_size=2)]
+        docs += await get_documents(store, [ref, ref])
+        return usage, docs
+
+    usage, docs = asyncio.run(handler())
+
+    assert len(docs) == 7
+    # Batched writes are billed once, by the commit; references are unwrapped for the client.
+    assert client.batch.return_value.set.call_args.args[0] is client.collection.return_value.document.return_value
+    assert (usage.calls, usage.reads, usage.writes) == (4, 8, 3)
+    assert usage.seconds >= 0
+    assert dict(usage.headers())[b"x-firestore-reads"] == b"8"
+    assert firestore_usage.get() is None
+
+
+def test_firestore_calls_outside_request_handlers_are_counted():
+    """Test that plain sync code such as the counter backfill is counted without any helper."""
+    client = MagicMock()
+    client.collection.return_value.select.return_value.stream.return_value = [
+        make_load_doc(f"load_{index}", posted_date=datetime(2024, 1, 1 + index % 2, tzinfo=timezone.utc))
+        for index in range(4)
+    ]
+    client.batch.return_value.__len__.return_value = 2
+    client.batch.return_value.commit.return_value = [MagicMock(), MagicMock()]
+    usage = FirestoreUsage()
+    token = firestore_usage.set(usage)
+    try:
+        assert backfill_daily_counts(Instrumented(client)) == {"2024-01-01": 2, "2024-01-02": 2}
+    finally:
+        firestore_usage.reset(token)
+
+    assert (usage.calls, usage.reads, usage.writes) == (2, 4, 2)
+
+
+def test_metrics_report_firestore_usage_per_route(authenticated_user_mock):
+    """Test that the documents streamed by an endpoint show up in its Firestore totals."""
+    request_metrics.reset()
+    authenticated_user_mock(TEST_SHIPPER_USER)
+    token = get_auth_token(TEST_SHIPPER_USER)
+    mock_db.collection.return_value.where.return_value.order_by.return_value.stream.return_value = [
+        make_load_doc(f"load_{index}", shipper_id=TEST_SHIPPER_USER["email"]) for index in range(3)
+    ]
+
+    response = client.get("/loads/shipper/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    body = client.get("/metrics").text
+    # The user lookup of the token plus the three streamed loads.
+    assert 'firestore_reads_total{method="GET",route="/loads/shipper/me"} 4' in body
+
+
+# === Startup Tests ===
+
+def test_app_import_defers_analytics_and_firebase():
+    """Test that importing the app neither loads pandas/statsmodels nor initializes Firebase."""
+    code = (
+        "import sys, backend.main\n"
+        "assert 'pandas' not in sys.modules and 'statsmodels.api' not in sys.modules and 'numpy' not in sys.modules\n"
+        "assert 'firebase_admin' not in sys.modules\n"
+    )
+    env = {**os.environ, "SECRET_KEY": "test-secret", "GOOGLE_APPLICATION_CREDENTIALS": ""}
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_root, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_lazy_client_remembers_a_failed_initialization():
+    """Test that a client that failed to initialize fails fast until its retry delay passes."""
+    factory = MagicMock(side_effect=[ValueError("bad credentials"), ValueError("bad credentials"), mock_db])
+    lazy = LazyClient(factory, retry_seconds=60)
+
+    for _ in range(3):
+        with pytest.raises(ValueError, match="bad credentials"):
+            lazy.collection("loads")
+    assert factory.call_count == 1
+
+    lazy.retry_seconds = 0
+    with pytest.raises(ValueError):
+        lazy.collection("loads")
+    assert lazy.get_client() is mock_db
+    assert factory.call_count == 3
+
+
+def test_startup_diagnostics_report_import_times():
+    """Test that the startup diagnostic lists the slowest imports of the app."""
+    response = client.get("/diagnostics/startup")
+
+    assert response.status_code == 200
+    imports = response.json()["imports"]
+    assert imports["total_ms"] > 0
+    assert imports["modules_loaded"] > 0
+    slowest = imports["slowest"]
+    assert slowest and {"module", "cumulative_ms", "self_ms"} <= set(slowest[0])
+    assert slowest == sorted(slowest, key=lambda row: row["cumulative_ms"], reverse=True)